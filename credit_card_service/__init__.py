@@ -1,3 +1,4 @@
-from .celery import app as celery_app
-
-__all__ = ("celery_app",)
\ No newline at end of file
+# The Celery app lives in credit_card_service.celery. It is not imported here
+# so the web process only loads Celery when it first enqueues a task; task
+# modules import the app themselves and `celery -A credit_card_service`
+# finds the submodule on its own.
@@ -2,6 +2,8 @@ import os
 
 from celery import Celery
 from celery.schedules import crontab
+from django.conf import settings
+from kombu import Queue
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "credit_card_service.settings")
 app = Celery("credit_card_service")
@@ -9,3 +11,61 @@ app = Celery("credit_card_service")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
+# Queues and the beat schedule are declared here rather than in settings so
+# that the web process does not import Celery until it first enqueues a task.
+app.conf.task_queues = (
+    Queue("interactive"),
+    Queue("batch"),
+)
+
+app.conf.beat_schedule = {
+    **{
+        'billing-slot-%02d' % slot: {
+            'task': 'repayment.tasks.billing_queue',
+            'schedule': crontab(hour=slot, minute=0),  # Bill one hourly slice of today's users
+            'args': (slot,),
+        }
+        for slot in range(settings.BILLING_SLOTS_PER_DAY)
+    },
+    'relay-outbox': {
+        'task': 'user.tasks.relay_outbox',
+        'schedule': 60.0,  # Sends anything a web process left in the outbox
+    },
+    'generate-pre-approved-offers-nightly': {
+        'task': 'user.tasks.generate_pre_approved_offers',
+        'schedule': crontab(hour=1, minute=0),  # Run every day at 1 AM
+    },
+    'accrue-interest-nightly': {
+        'task': 'repayment.tasks.accrue_interest',
+        'schedule': crontab(hour=0, minute=5),  # Run every day at 12:05 AM, for the day before
+    },
+    'snapshot-portfolio-nightly': {
+        'task': 'repayment.tasks.snapshot_portfolio',
+        'schedule': crontab(hour=0, minute=30),  # Run every day at 12:30 AM
+    },
+    'archive-transactions-nightly': {
+        'task': 'repayment.tasks.archive_transactions',
+        'schedule': crontab(hour=2, minute=0),  # Run every day at 2 AM
+    },
+    'send-due-reminders-daily': {
+        'task': 'repayment.tasks.send_due_reminders',
+        'schedule': crontab(hour=8, minute=0),  # Run every day at 8 AM
+    },
+}
+
+# Worker command line options per queue. Interactive tasks are short, so the
+# worker prefetches a few to save broker round trips; batch tasks are long,
+# so each batch process reserves only the task it is running.
+WORKER_PROFILES = {
+    "interactive": [
+        "--queues=interactive",
+        "--concurrency=4",
+        "--prefetch-multiplier=4",
+    ],
+    "batch": [
+        "--queues=batch",
+        "--concurrency=2",
+        "--prefetch-multiplier=1",
+        "--max-tasks-per-child=50",
+    ],
+}
@@ -0,0 +1,67 @@
+"""
+Lean path for the JSON API requests.
+
+LeanAPIMiddleware sits right after SecurityMiddleware. JSON calls (a JSON
+body, or a GET that does not ask for HTML) that match `api_urlpatterns` in
+urls.py, with a method the route is registered for, are dispatched straight
+to the view from there, so they skip the session, CSRF, auth, messages and
+clickjacking middleware after it. Those views run without DRF
+authentication or permissions and always render JSON, skipping content
+negotiation. Everything else, including the HTML pages and form posts on
+the same paths, carries on through the full stack.
+"""
+from django.conf import settings
+from django.urls import Resolver404, URLResolver
+from django.urls.resolvers import RegexPattern
+from django.utils.module_loading import import_string
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+
+
+def is_json_call(request):
+    if request.method in ('GET', 'HEAD'):
+        return 'text/html' not in request.headers.get('Accept', '')
+    return request.content_type == 'application/json'
+
+
+class JSONNegotiation(DefaultContentNegotiation):
+    """Picks the parser by content type as usual, but always renders JSON."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def lean_api_view(view_class, *methods):
+    """A JSON-only view of the APIView `view_class`, served on the lean path for `methods`."""
+    view = view_class.as_view(
+        authentication_classes=(),
+        permission_classes=(),
+        renderer_classes=(JSONRenderer,),
+        content_negotiation_class=JSONNegotiation,
+    )
+    view.lean_methods = frozenset(method.upper() for method in methods)
+    return view
+
+
+class LeanAPIMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.resolver = URLResolver(RegexPattern(r'^/'), import_string(settings.LEAN_API_ROUTES))
+
+    def __call__(self, request):
+        try:
+            match = self.resolver.resolve(request.path_info)
+        except Resolver404:
+            return self.get_response(request)
+        if request.method not in match.func.lean_methods or not is_json_call(request):
+            return self.get_response(request)
+
+        # Host validation is otherwise first done by CommonMiddleware, which this path skips.
+        request.get_host()
+        request.resolver_match = match
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if not response.streaming and not response.has_header('Content-Length'):
+            response.headers['Content-Length'] = str(len(response.content))
+        return response
@@ -0,0 +1,37 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that avoids an exact COUNT(*) over a whole table.
+
+    Unfiltered changelists use the database's row estimate (pg_class.reltuples
+    on PostgreSQL, the highest rowid on SQLite); filtered ones, which are
+    narrowed by indexed filters, still count exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not getattr(queryset, 'query', None) or queryset.query.where:
+            return super().count
+        estimate = self.estimate(queryset)
+        return super().count if estimate is None else estimate
+
+    def estimate(self, queryset):
+        connection = connections[queryset.db]
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'sqlite':
+                cursor.execute(f'SELECT MAX(rowid) FROM {table}')
+            else:
+                return None
+            row = cursor.fetchone()
+        # A negative or missing estimate means the table was never analyzed.
+        if not row or row[0] is None or row[0] < 0:
+            return None
+        return int(row[0])
@@ -11,7 +11,6 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 from pathlib import Path
-from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'credit_card_service.lean_api.LeanAPIMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,13 +54,21 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = 'credit_card_service.urls'
+# JSON API routes served by LeanAPIMiddleware without the rest of the middleware
+LEAN_API_ROUTES = 'credit_card_service.urls.api_urlpatterns'
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
-        'APP_DIRS': True,
+        'DIRS': [BASE_DIR / 'templates'],
         'OPTIONS': {
+            # Templates are compiled once per process and reused for every render.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -84,6 +92,14 @@ DATABASES = {
     }
 }
 
+# Customer data (users, loans, payments, transactions) is spread over these
+# database aliases by a hash of the user_id (see credit_card_service/sharding.py).
+# To try it locally, add e.g. 'shard1': {..., 'NAME': BASE_DIR / 'shard1.sqlite3'}
+# to DATABASES, list it here and run `manage.py migrate_shards`. Changing the
+# number of shards moves customers between them, so it needs a data migration.
+LOAN_SHARDS = ('default',)
+DATABASE_ROUTERS = ['credit_card_service.sharding.ShardRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -130,13 +146,131 @@ import os
 STATICFILES_DIRS = os.path.join(BASE_DIR, 'static'),
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles_build', 'static')
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Responses to POSTs carrying an Idempotency-Key header are replayed from
+# this cache for retries within the TTL.
+IDEMPOTENCY_CACHE = 'default'
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# The app is served behind one proxy (Vercel's edge, see vercel..json), so the
+# client address used for rate limits and velocity checks is the last
+# X-Forwarded-For entry, the one that proxy added. Entries a client sends
+# itself come before it and are ignored.
+REST_FRAMEWORK = {
+    'NUM_PROXIES': 1,
+}
+
+# Token buckets for the write endpoints (see credit_card_service/throttling.py):
+# each client address and each loan may burst up to `capacity` requests, then
+# gets `per_second` more. Requests beyond that get 429 with Retry-After.
+RATE_LIMIT_CACHE = 'default'
+RATE_LIMITS = {
+    'client': {'capacity': 20, 'per_second': 5},
+    'loan': {'capacity': 5, 'per_second': 0.5},
+}
+# Write requests a web process handles at once before shedding load.
+WRITE_CONCURRENCY_LIMIT = 16
+WRITE_RETRY_AFTER = 1
+
+# Payment velocity checks (see repayment/velocity.py): payments per loan and per
+# client address over a sliding `window` of seconds, counted in `buckets` slots.
+# A payment making `flag` or more is logged; one beyond `max` is refused.
+VELOCITY_CACHE = 'default'
+VELOCITY_LIMITS = {
+    'loan': {'window': 10 * 60, 'buckets': 10, 'flag': 3, 'max': 5},
+    'client': {'window': 10 * 60, 'buckets': 10, 'flag': 20, 'max': 50},
+}
+
+# Tasks queued through the outbox (user/outbox.py) are sent in batches of
+# OUTBOX_BATCH_SIZE after commit; the relay also polls every OUTBOX_POLL_INTERVAL seconds.
+# A claimed batch not sent within OUTBOX_CLAIM_TIMEOUT seconds is sent again.
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_POLL_INTERVAL = 5
+OUTBOX_CLAIM_TIMEOUT = 60
+
+# Every loan's ledger gets a balance snapshot every LEDGER_SNAPSHOT_EVERY events,
+# so a point-in-time balance replays at most that many events.
+LEDGER_SNAPSHOT_EVERY = 50
+
+# Settlement files (see repayment/settlement.py) are applied SETTLEMENT_CHUNK_SIZE
+# rows at a time, with one DB transaction per chunk and shard.
+SETTLEMENT_CHUNK_SIZE = 5000
+
+# Pages of the change feed (/api/changes/, see repayment/changes.py) hold at
+# most CHANGE_FEED_PAGE_SIZE rows.
+CHANGE_FEED_PAGE_SIZE = 1000
+
+# Interest is accrued nightly into Loan.accrued_interest (see repayment/accrual.py)
+# with one UPDATE per INTEREST_ACCRUAL_BATCH_SIZE loans.
+INTEREST_ACCRUAL_BATCH_SIZE = 5000
+
+# Every night a reminder is sent for each unpaid installment due in the next
+# REMINDER_DAYS_AHEAD days (see repayment/reminders.py), rendered and handed to
+# REMINDER_SENDER REMINDER_BATCH_SIZE at a time. FileSender writes them under
+# REMINDER_OUTBOX_DIR; use 'repayment.reminders.EmailSender' to email them.
+REMINDER_DAYS_AHEAD = 3
+REMINDER_BATCH_SIZE = 2000
+REMINDER_SENDER = 'repayment.reminders.FileSender'
+REMINDER_OUTBOX_DIR = BASE_DIR / 'data' / 'reminders'
+
+# Transactions older than the retention window are moved out of the hot
+# table into monthly compressed segments under TRANSACTION_ARCHIVE_DIR.
+TRANSACTION_RETENTION_DAYS = 180
+TRANSACTION_ARCHIVE_DIR = BASE_DIR / 'data' / 'archive' / 'transactions'
+
+# Cold start budget for the web process, enforced by `manage.py check_import_time`.
+# Heavy libraries are only used by Celery workers and must be imported lazily;
+# Celery itself is loaded on the first enqueue.
+WEB_IMPORT_TIME_BUDGET_MS = 600
+WEB_FORBIDDEN_IMPORTS = ('pandas', 'numpy', 'celery', 'kombu')
+
 # Celery settings
 CELERY_BROKER_URL = "redis://localhost:6379"
 CELERY_RESULT_BACKEND = "redis://localhost:6379"
 
-CELERY_BEAT_SCHEDULE = {
-    'run-everyday-at-midnight': {
-        'task': 'repayment.tasks.billing_queue',
-        'schedule': crontab(hour=0),  # Run every day at midnight 12
-    },
+# Interactive tasks are triggered by API requests and must not wait behind
+# batch runs (billing, nightly jobs), so each kind gets its own queue and
+# its own workers (see credit_card_service/celery.py).
+CELERY_TASK_DEFAULT_QUEUE = "batch"
+CELERY_TASK_ROUTES = {
+    "user.tasks.update_credit_score": {"queue": "interactive"},
+    "repayment.tasks.update_next_emis": {"queue": "interactive"},
+    "user.tasks.relay_outbox": {"queue": "interactive"},
+    "repayment.tasks.billing_queue": {"queue": "batch"},
+    "repayment.tasks.rebill_loans": {"queue": "batch"},
+    "repayment.tasks.recompute_emis": {"queue": "batch"},
+    "user.tasks.update_credit_scores": {"queue": "batch"},
+    "repayment.tasks.snapshot_portfolio": {"queue": "batch"},
+    "repayment.tasks.archive_transactions": {"queue": "batch"},
+    "repayment.tasks.send_due_reminders": {"queue": "batch"},
+    "repayment.tasks.accrue_interest": {"queue": "batch"},
+    "user.tasks.generate_pre_approved_offers": {"queue": "batch"},
 }
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_TASK_ANNOTATIONS = {
+    "user.tasks.update_credit_score": {"rate_limit": "50/s", "soft_time_limit": 10},
+    "repayment.tasks.update_next_emis": {"rate_limit": "50/s", "soft_time_limit": 10},
+    "repayment.tasks.billing_queue": {"soft_time_limit": 55 * 60},  # Finish within its hourly slot
+    "repayment.tasks.rebill_loans": {"soft_time_limit": 30 * 60},
+    "repayment.tasks.recompute_emis": {"soft_time_limit": 30 * 60},
+    "user.tasks.update_credit_scores": {"soft_time_limit": 30 * 60},
+    "repayment.tasks.snapshot_portfolio": {"soft_time_limit": 30 * 60},
+    "repayment.tasks.archive_transactions": {"soft_time_limit": 60 * 60},
+    "repayment.tasks.send_due_reminders": {"soft_time_limit": 60 * 60},
+    "repayment.tasks.accrue_interest": {"soft_time_limit": 30 * 60},
+    "user.tasks.generate_pre_approved_offers": {"soft_time_limit": 60 * 60},
+}
+
+# Billing calendar: users are spread evenly over BILLING_DAYS days of the month
+# and BILLING_SLOTS_PER_DAY hourly slices of each day.
+BILLING_DAYS = 28
+BILLING_SLOTS_PER_DAY = 24
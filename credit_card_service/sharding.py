@@ -0,0 +1,98 @@
+"""
+Hash sharding of customer data across the databases in LOAN_SHARDS.
+
+A user and everything that belongs to them (loans, payments, transactions,
+ledger events, pre-approved offers) live on the shard picked by a hash of
+the user_id, so joins between them stay on one database. A new loan's id is
+aligned to its user's shard, so a loan_id alone is enough to find the shard
+too. Models not listed here (portfolio snapshots, archive segments, Django's
+own tables) stay on 'default'. With the default LOAN_SHARDS = ('default',)
+nothing moves.
+"""
+import uuid
+from django.conf import settings
+
+SHARDED_MODELS = {
+    'user.user': 'user_id',
+    'user.loan': 'user_id',
+    'user.preapprovedoffer': 'user_id',
+    'repayment.payment': 'loan_id',
+    'repayment.transaction': 'loan_id',
+    'repayment.loanevent': 'loan_id',
+    'repayment.loanbalancesnapshot': 'loan_id',
+    'repayment.transactionarchiveentry': 'loan_id',
+    'repayment.archivedtransactionreference': 'loan_id',
+}
+# Created explicitly on the database whose transaction they belong to.
+PER_SHARD_MODELS = {'user.outboxmessage', 'repayment.changesequence'}
+
+
+def shard_aliases():
+    return tuple(settings.LOAN_SHARDS)
+
+
+def all_aliases():
+    """'default' followed by every shard, without duplicates."""
+    return tuple(dict.fromkeys(('default',) + shard_aliases()))
+
+
+def _shard_of(value):
+    aliases = shard_aliases()
+    return aliases[uuid.UUID(str(value)).int % len(aliases)]
+
+
+def shard_for_user(user_id):
+    """The database holding a user's rows. Raises ValueError for a malformed id."""
+    return _shard_of(user_id)
+
+
+def shard_for_loan(loan_id):
+    """The database holding a loan, its payments and transactions. Raises ValueError for a malformed id."""
+    return _shard_of(loan_id)
+
+
+def aligned_loan_id(loan_id, user_id):
+    """Returns `loan_id` with its low bits changed so that it hashes to the user's shard."""
+    shards = len(shard_aliases())
+    loan_int = uuid.UUID(str(loan_id)).int
+    return uuid.UUID(int=loan_int - loan_int % shards + uuid.UUID(str(user_id)).int % shards)
+
+
+def shard_for_instance(instance):
+    field = SHARDED_MODELS[instance._meta.label_lower]
+    return _shard_of(getattr(instance, field))
+
+
+class ShardRouter:
+    """Routes sharded models by the instance they are read or written for."""
+
+    def db_for_model(self, model, **hints):
+        if model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if instance._state.db:
+            return instance._state.db
+        if instance._meta.label_lower in SHARDED_MODELS:
+            return shard_for_instance(instance)
+        return None
+
+    db_for_read = db_for_model
+    db_for_write = db_for_model
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._state.db and obj2._state.db:
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if model_name is None:
+            return None
+        label = f'{app_label}.{model_name}'
+        if label in SHARDED_MODELS:
+            return db in shard_aliases()
+        if label in PER_SHARD_MODELS:
+            return db in all_aliases()
+        # Everything else lives on the default database only.
+        return db == 'default'
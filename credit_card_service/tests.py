@@ -0,0 +1,113 @@
+import datetime
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+
+from credit_card_service.rendering import render_rows, row_format
+from credit_card_service.sharding import ShardRouter, aligned_loan_id, shard_for_loan, shard_for_user
+from repayment.models import Payment, PortfolioSnapshot
+from repayment.tests import create_loan
+from user.models import Loan, User
+
+SCRIPT = '<script>alert(1)</script>'
+
+
+class RowTemplateTests(SimpleTestCase):
+    def row(self, **values):
+        return {'user_id': uuid.uuid4(), 'name': 'a', 'email': 'a@example.com', 'aadhar_number': '1', 'annual_income': 1, **values}
+
+    def test_values_are_escaped_by_default(self):
+        html = ''.join(render_rows('user/register_user_row.html', [self.row(name=SCRIPT, annual_income=SCRIPT)]))
+        self.assertNotIn('<script>', html)
+        self.assertEqual(html.count('&lt;script&gt;alert(1)&lt;/script&gt;'), 2)
+
+    def test_safe_columns_are_printed_as_they_are(self):
+        row = self.row(name=SCRIPT, annual_income=5000)
+        html = row_format('user/register_user_row.html', ('annual_income',))(row)
+        self.assertIn('<td>5000</td>', html)
+        self.assertIn('&lt;script&gt;', html)
+
+    def test_format_specs_are_applied(self):
+        html = row_format('repayment/statement_transaction_row.html')(
+            {'transaction_id': 'T1', 'amount': 5, 'created': datetime.datetime(2026, 2, 3, 4, 5)},
+        )
+        self.assertIn('<td>2026-02-03 04:05</td>', html)
+
+
+@override_settings(LOAN_SHARDS=('default', 'shard1', 'shard2'))
+class ShardRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ShardRouter()
+
+    def test_users_are_routed_by_their_id(self):
+        for value in range(6):
+            user = User(user_id=uuid.UUID(int=value))
+            self.assertEqual(self.router.db_for_write(User, instance=user), ('default', 'shard1', 'shard2')[value % 3])
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_loans_and_payments_follow_their_user(self):
+        user = User(user_id=uuid.uuid4())
+        loan = Loan(loan_id=aligned_loan_id(uuid.uuid4(), user.user_id), user=user)
+        self.assertEqual(shard_for_loan(loan.loan_id), shard_for_user(user.user_id))
+        self.assertEqual(self.router.db_for_write(Loan, instance=loan), shard_for_user(user.user_id))
+        self.assertEqual(self.router.db_for_write(Payment, instance=Payment(loan=loan)), shard_for_user(user.user_id))
+
+    def test_saved_instance_stays_on_its_database(self):
+        user = User(user_id=uuid.UUID(int=1))
+        user._state.db = 'shard2'
+        self.assertEqual(self.router.db_for_read(User, instance=user), 'shard2')
+
+    def test_unsharded_models_are_not_routed(self):
+        self.assertIsNone(self.router.db_for_write(PortfolioSnapshot, instance=PortfolioSnapshot()))
+
+    def test_allow_migrate(self):
+        for db in ('default', 'shard1'):
+            self.assertTrue(self.router.allow_migrate(db, 'user', 'loan'))
+            self.assertTrue(self.router.allow_migrate(db, 'user', 'outboxmessage'))
+        self.assertFalse(self.router.allow_migrate('shard1', 'repayment', 'portfoliosnapshot'))
+        self.assertFalse(self.router.allow_migrate('shard1', 'auth', 'user'))
+        self.assertTrue(self.router.allow_migrate('default', 'repayment', 'portfoliosnapshot'))
+        self.assertIsNone(self.router.allow_migrate('shard1', 'user'))
+
+    @override_settings(LOAN_SHARDS=('shard1', 'shard2'))
+    def test_default_keeps_per_shard_tables_when_it_holds_no_shard(self):
+        self.assertFalse(self.router.allow_migrate('default', 'user', 'loan'))
+        self.assertTrue(self.router.allow_migrate('default', 'user', 'outboxmessage'))
+        self.assertTrue(self.router.allow_migrate('shard2', 'repayment', 'changesequence'))
+
+
+class LeanAPITests(TestCase):
+    """JSON calls served on the lean path get the same responses as through the full middleware stack."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def pay_each(self, loan):
+        bodies = [
+            {'loan_id': str(uuid.uuid4()), 'amount': 500},
+            {'loan_id': str(loan.loan_id)},
+            {'loan_id': str(loan.loan_id), 'amount': 1},
+            {'loan_id': str(loan.loan_id), 'amount': 500},
+        ]
+        client = Client()
+        return [client.post('/api/make-payment/', body, content_type='application/json') for body in bodies]
+
+    def test_payment_responses_match_the_full_stack(self):
+        lean = self.pay_each(create_loan('a', '123412341230'))
+        full_stack = [name for name in settings.MIDDLEWARE if name != 'credit_card_service.lean_api.LeanAPIMiddleware']
+        with override_settings(MIDDLEWARE=full_stack):
+            full = self.pay_each(create_loan('b', '123412341231'))
+
+        # X-Frame-Options is set by XFrameOptionsMiddleware, which the lean path skips
+        self.assertFalse(any(response.has_header('X-Frame-Options') for response in lean))
+        self.assertTrue(all(response.has_header('X-Frame-Options') for response in full))
+        self.assertEqual([response.status_code for response in lean], [400, 400, 400, 200])
+        self.assertEqual(
+            [(response.status_code, response.json()) for response in lean],
+            [(response.status_code, response.json()) for response in full],
+        )
+        self.assertEqual(int(lean[-1]['Content-Length']), len(lean[-1].content))
+        self.assertEqual(list(Loan.objects.values_list('principal_balance', flat=True)), [4500, 4500])
@@ -0,0 +1,111 @@
+"""
+Backpressure for the write endpoints.
+
+TokenBucketThrottle subclasses are DRF throttles: each client or loan gets a
+bucket of RATE_LIMITS[scope]['capacity'] tokens refilled at 'per_second',
+kept in the RATE_LIMIT_CACHE. `concurrency_limited` caps how many write
+requests a process works on at once. Both reject with 429 and Retry-After
+before the view runs a query. Safe methods (the HTML pages) are never limited.
+"""
+import functools
+import json
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+_gate = None
+_gate_lock = threading.Lock()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def get_bucket_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS:
+            return True
+        ident = self.get_bucket_key(request, view)
+        if ident is None:
+            return True
+
+        limit = settings.RATE_LIMITS[self.scope]
+        capacity, per_second = limit['capacity'], limit['per_second']
+        cache = caches[settings.RATE_LIMIT_CACHE]
+        key = f'ratelimit:{self.scope}:{ident}'
+
+        # The bucket is refilled lazily from the time it was last touched. An
+        # untouched bucket expires once it would be full again anyway.
+        now = time.time()
+        tokens, updated = cache.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * per_second)
+        if tokens < 1:
+            self.retry_after = (1 - tokens) / per_second
+            return False
+        cache.set(key, (tokens - 1, now), math.ceil(capacity / per_second))
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class ClientRateThrottle(TokenBucketThrottle):
+    """Limits write requests per client address."""
+    scope = 'client'
+
+    def get_bucket_key(self, request, view):
+        return self.get_ident(request)
+
+
+class LoanRateThrottle(TokenBucketThrottle):
+    """Limits write requests per loan_id in the request payload."""
+    scope = 'loan'
+
+    def get_bucket_key(self, request, view):
+        # Read through the Django request so the view can still parse the body itself.
+        django_request = request._request
+        if django_request.content_type == 'application/x-www-form-urlencoded':
+            return django_request.POST.get('loan_id')
+        try:
+            loan_id = json.loads(django_request.body).get('loan_id')
+        except (ValueError, AttributeError):
+            return None
+        return str(loan_id) if loan_id else None
+
+
+def _get_gate():
+    global _gate
+    if _gate is None:
+        with _gate_lock:
+            if _gate is None:
+                _gate = threading.BoundedSemaphore(settings.WRITE_CONCURRENCY_LIMIT)
+    return _gate
+
+
+def concurrency_limited(view_method):
+    """
+    Sheds an APIView handler's requests with 429 while WRITE_CONCURRENCY_LIMIT
+    requests are already being handled in this process.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        gate = _get_gate()
+        if not gate.acquire(blocking=False):
+            return Response(
+                data={"error": "The server is busy. Please retry."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(settings.WRITE_RETRY_AFTER)},
+            )
+        try:
+            return view_method(self, request, *args, **kwargs)
+        finally:
+            gate.release()
+
+    return wrapper
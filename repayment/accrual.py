@@ -0,0 +1,100 @@
+"""
+Nightly interest accrual.
+
+Every ACTIVE loan accrues simple interest on its principal balance each day
+into Loan.accrued_interest (paise), the figure the payment and billing paths
+read. The job is set-based: for each shard and each day the loans were last
+accrued through (normally just yesterday), UPDATE statements over ranges of
+INTEREST_ACCRUAL_BATCH_SIZE loan ids add the interest with the same
+integer, round-half-up formula as money.interest, computed by the database.
+The same batch appends one INTEREST event per loan to the ledger
+(repayment.ledger) with the interest it added, so the ledger's interest
+balance follows Loan.accrued_interest. Each batch commits on its own, as one
+change in the change feed (repayment.changes). Loans already accrued through the run
+date are skipped, so an interrupted run can simply be repeated and a missed
+night is caught up by the next run.
+"""
+import datetime
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, F, Value
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+from credit_card_service.sharding import shard_aliases
+from repayment import changes, money
+from repayment.ledger import record_events
+
+INTEREST_DENOMINATOR = money.BASIS_POINTS * money.DAYS_PER_YEAR
+
+
+def interest_expression(days):
+    """money.interest(principal in paise, rate in basis points, days) as a database expression."""
+    principal_paise = Cast(F('principal_balance'), BigIntegerField()) * money.PAISE_PER_RUPEE
+    rate_bp = Cast(Round(F('interest_rate') * 100), BigIntegerField())
+    return (principal_paise * rate_bp * days + Value(INTEREST_DENOMINATOR // 2)) / Value(INTEREST_DENOMINATOR)
+
+
+def accruing_loans(day, using):
+    from user.models import Loan
+    return Loan.objects.using(using).filter(loan_status='ACTIVE', principal_balance__gt=0, interest_accrued_through__lt=day)
+
+
+def accrue_range(loans, days, day, batch_size):
+    """
+    Accrues `days` of interest on `loans` with one UPDATE per batch_size ids and records
+    it as INTEREST events. Returns the rows updated.
+    """
+    from repayment.models import LoanEvent
+
+    updated = 0
+    after = None
+    while True:
+        batch = loans if after is None else loans.filter(loan_id__gt=after)
+        # The last id of the next batch bounds the UPDATE to a range of the primary key.
+        upper = batch.order_by('loan_id').values_list('loan_id', flat=True)[batch_size - 1:batch_size].first()
+        if upper is not None:
+            batch = batch.filter(loan_id__lte=upper)
+        with transaction.atomic(using=loans.db):
+            change_seq = changes.next_sequence(loans.db)
+            accrued = list(batch.select_for_update().annotate(
+                interest_paise=interest_expression(days),
+            ).values_list('loan_id', 'interest_paise'))
+            updated += batch.update(
+                accrued_interest=F('accrued_interest') + interest_expression(days),
+                interest_accrued_through=day,
+                change_seq=change_seq,
+            )
+            record_events([
+                LoanEvent(
+                    loan_id=loan_id, kind='INTEREST', interest_delta=interest_paise,
+                    data={'days': days, 'through': day.isoformat()},
+                )
+                for loan_id, interest_paise in accrued if interest_paise
+            ], loans.db)
+        if upper is None:
+            return updated
+        after = upper
+
+
+def accrue_interest(day=None, batch_size=None):
+    """
+    Accrues interest on every ACTIVE loan through `day` (yesterday by default), shard by shard.
+    Returns the number of loans accrued.
+    """
+    from user.models import Loan
+
+    day = day or timezone.localdate() - datetime.timedelta(days=1)
+    batch_size = batch_size or settings.INTEREST_ACCRUAL_BATCH_SIZE
+    accrued = 0
+    for shard in shard_aliases():
+        # Loans created with bulk_create start accruing from their disbursement.
+        with transaction.atomic(using=shard):
+            Loan.objects.using(shard).filter(interest_accrued_through__isnull=True).update(
+                interest_accrued_through=F('disbursement_date'),
+                change_seq=changes.next_sequence(shard),
+            )
+        loans = accruing_loans(day, shard)
+        for accrued_through in list(loans.order_by().values_list('interest_accrued_through', flat=True).distinct()):
+            days = (day - accrued_through).days
+            accrued += accrue_range(loans.filter(interest_accrued_through=accrued_through), days, day, batch_size)
+    return accrued
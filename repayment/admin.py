@@ -1,13 +1,29 @@
 from django.contrib import admin
-from .models import Payment, Transaction
+from credit_card_service.paginators import EstimatedCountPaginator
+from .models import Payment, Transaction, PortfolioSnapshot
 
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ('loan', 'emi_amount', 'total_paid', 'due_date', 'status')
+    list_select_related = ('loan',)
+    list_filter = ('status', 'due_date')
+    raw_id_fields = ('loan',)
+    ordering = ('due_date', 'payment_id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('loan', 'amount', 'created')
+    list_select_related = ('loan',)
+    raw_id_fields = ('loan',)
+    ordering = ('-created', 'transaction_id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
+
+@admin.register(PortfolioSnapshot)
+class PortfolioSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('snapshot_date', 'billing_day', 'loan_type', 'loan_count', 'outstanding_principal', 'collections')
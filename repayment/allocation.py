@@ -0,0 +1,81 @@
+from django.db import transaction
+from credit_card_service.sharding import shard_for_loan
+from repayment import changes, money
+from repayment.ledger import record_event
+
+# Installments are paid off in this order of status, then by due date.
+ALLOCATION_ORDER = ('DUE', 'PARTIALLY_COMPLETED', 'NOT_DUE')
+
+
+def allocation_key(payment):
+    return ALLOCATION_ORDER.index(payment.status), payment.due_date
+
+
+def allocate(payments, amount):
+    """
+    Applies `amount` across `payments` in waterfall order, in one pass.
+    Updates total_paid and status in memory and returns (changed payments, unallocated amount).
+
+    A DUE installment that is only partly covered becomes PARTIALLY_COMPLETED;
+    a partly prepaid NOT_DUE installment stays NOT_DUE until it is billed.
+    """
+    changed = []
+    remaining = amount
+    for payment in sorted(payments, key=allocation_key):
+        if remaining <= 0:
+            break
+        outstanding = payment.emi_amount - payment.total_paid
+        if outstanding <= 0:
+            continue
+        applied = min(outstanding, remaining)
+        payment.total_paid += applied
+        remaining -= applied
+        if payment.total_paid >= payment.emi_amount:
+            payment.status = 'COMPLETED'
+        elif payment.status == 'DUE':
+            payment.status = 'PARTIALLY_COMPLETED'
+        changed.append(payment)
+    return changed, remaining
+
+
+def open_payments(loan_ids, using=None):
+    """Loads the installments that can still receive money, for one or many loans, in one query."""
+    from repayment.models import Payment
+    return Payment.objects.using(using).filter(loan__in=loan_ids, status__in=ALLOCATION_ORDER).order_by('due_date')
+
+
+def apply_payment(loan_id, amount):
+    """
+    Records a repayment: inserts the Transaction and the ledger event, allocates it
+    over the loan's installments, reduces the principal balance and settles the accrued interest,
+    all in one DB transaction.
+    """
+    from user.models import Loan
+    from repayment.models import Payment, Transaction
+
+    using = shard_for_loan(loan_id)
+    with transaction.atomic(using=using):
+        # Taken before the loan is locked, as by every writer (see repayment.changes)
+        change_seq = changes.next_sequence(using)
+        loan = Loan.objects.using(using).select_for_update().get(loan_id=loan_id)
+        Transaction(loan=loan, amount=amount).save(using=using, change_seq=change_seq)
+        # The payment covers the interest accrued so far first, then the principal
+        interest_part, principal_part = money.split_payment(amount, loan.accrued_interest)
+        record_event(
+            loan, 'PAYMENT', amount=amount,
+            principal_delta=-principal_part, interest_delta=-money.to_paise(interest_part),
+        )
+
+        changed, _ = allocate(list(open_payments([loan.loan_id], using)), amount)
+        for payment in changed:
+            payment.change_seq = change_seq
+        Payment.objects.using(using).bulk_update(changed, ['total_paid', 'status', 'change_seq'])
+
+        if loan.principal_balance == principal_part:
+            loan.principal_balance = 0
+            loan.loan_status = "REPAID"
+        else:
+            loan.principal_balance -= principal_part
+        loan.accrued_interest -= money.to_paise(interest_part)
+        loan.save(update_fields=['principal_balance', 'loan_status', 'accrued_interest'], change_seq=change_seq)
+    return loan
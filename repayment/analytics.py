@@ -0,0 +1,160 @@
+import datetime
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from credit_card_service.sharding import shard_aliases
+
+BILLING_DAY = 'loan__user__billing_day'
+LOAN_TYPE = 'loan__loan_type'
+
+SNAPSHOT_FIELDS = (
+    'loan_count', 'stopped_count', 'outstanding_principal',
+    'due_count', 'partially_completed_count', 'collections',
+)
+
+
+def _collect_groups(rows, groups, billing_day_key, loan_type_key, fields):
+    for row in rows:
+        key = (row[billing_day_key], row[loan_type_key])
+        group = groups.setdefault(key, {})
+        for field in fields:
+            group[field] = (row[field] or 0) + group.get(field, 0)
+
+
+def compute_portfolio_aggregates(snapshot_date):
+    """
+    Computes the portfolio aggregates with one GROUP BY query per table and shard.
+    Returns {(billing_day, loan_type): {field: value}}.
+    """
+    groups = {}
+    for shard in shard_aliases():
+        _collect_shard_aggregates(groups, shard, snapshot_date)
+    return groups
+
+
+def _collect_shard_aggregates(groups, shard, snapshot_date):
+    from user.models import Loan
+    from repayment.models import Payment, Transaction
+
+    loans = Loan.objects.using(shard).order_by().values('user__billing_day', 'loan_type').annotate(
+        loan_count=Count('loan_id'),
+        stopped_count=Count('loan_id', filter=Q(loan_status='STOPPED')),
+        outstanding_principal=Sum('principal_balance', filter=~Q(loan_status='REPAID')),
+    )
+    _collect_groups(loans, groups, 'user__billing_day', 'loan_type',
+                    ('loan_count', 'stopped_count', 'outstanding_principal'))
+
+    payments = Payment.objects.using(shard).order_by().filter(
+        status__in=['DUE', 'PARTIALLY_COMPLETED'],
+    ).values(BILLING_DAY, LOAN_TYPE).annotate(
+        due_count=Count('payment_id', filter=Q(status='DUE')),
+        partially_completed_count=Count('payment_id', filter=Q(status='PARTIALLY_COMPLETED')),
+    )
+    _collect_groups(payments, groups, BILLING_DAY, LOAN_TYPE,
+                    ('due_count', 'partially_completed_count'))
+
+    collections = Transaction.objects.using(shard).order_by().filter(
+        created__date=snapshot_date,
+    ).values(BILLING_DAY, LOAN_TYPE).annotate(collections=Sum('amount'))
+    _collect_groups(collections, groups, BILLING_DAY, LOAN_TYPE, ('collections',))
+
+
+def take_portfolio_snapshot(snapshot_date=None):
+    """
+    Materializes the portfolio aggregates for `snapshot_date` (yesterday by default).
+    Re-running for the same date replaces that day's rows.
+    """
+    from repayment.models import PortfolioSnapshot
+
+    computed_at = timezone.now()
+    if snapshot_date is None:
+        snapshot_date = computed_at.date() - datetime.timedelta(days=1)
+
+    groups = compute_portfolio_aggregates(snapshot_date)
+    snapshots = [
+        PortfolioSnapshot(
+            snapshot_date=snapshot_date,
+            computed_at=computed_at,
+            billing_day=billing_day,
+            loan_type=loan_type,
+            **values,
+        )
+        for (billing_day, loan_type), values in groups.items()
+    ]
+
+    with transaction.atomic():
+        PortfolioSnapshot.objects.filter(snapshot_date=snapshot_date).delete()
+        PortfolioSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+
+def get_portfolio_stats():
+    """
+    Serves the latest snapshot plus the activity since it was computed.
+
+    The snapshot's loan counts and outstanding principal are as of its
+    computed_at, so loans created and principal repaid (the principal part of
+    PAYMENT ledger events) after that are added to them. Its collections cover
+    the snapshot date, so collections_since_snapshot counts from the start of
+    the next day, including the payments made before the snapshot ran. Only
+    rows in those windows are read, via the indexed `created` and `occurred_at` columns.
+    """
+    from user.models import Loan
+    from repayment.models import LoanEvent, PortfolioSnapshot, Transaction
+
+    latest = PortfolioSnapshot.objects.order_by('-snapshot_date').first()
+    if latest is None:
+        return None
+
+    groups = {}
+
+    def group_for(key):
+        return groups.setdefault(key, {
+            'billing_day': key[0],
+            'loan_type': key[1],
+            **{field: 0 for field in SNAPSHOT_FIELDS},
+            'collections_since_snapshot': 0,
+        })
+
+    for row in PortfolioSnapshot.objects.filter(snapshot_date=latest.snapshot_date):
+        group = group_for((row.billing_day, row.loan_type))
+        for field in SNAPSHOT_FIELDS:
+            group[field] = getattr(row, field)
+
+    day_after = timezone.make_aware(
+        datetime.datetime.combine(latest.snapshot_date + datetime.timedelta(days=1), datetime.time.min),
+    )
+    for shard in shard_aliases():
+        new_loans = Loan.objects.using(shard).order_by().filter(created__gt=latest.computed_at).values(
+            'user__billing_day', 'loan_type',
+        ).annotate(loan_count=Count('loan_id'), disbursed=Sum('loan_amount'))
+        for row in new_loans:
+            group = group_for((row['user__billing_day'], row['loan_type']))
+            group['loan_count'] += row['loan_count']
+            group['outstanding_principal'] += row['disbursed'] or 0
+
+        new_collections = Transaction.objects.using(shard).order_by().filter(created__gte=day_after).values(
+            BILLING_DAY, LOAN_TYPE,
+        ).annotate(collected=Sum('amount'))
+        for row in new_collections:
+            group = group_for((row[BILLING_DAY], row[LOAN_TYPE]))
+            group['collections_since_snapshot'] += row['collected'] or 0
+
+        # principal_delta is negative: the part of each payment that went to principal rather than interest
+        repaid = LoanEvent.objects.using(shard).order_by().filter(
+            kind='PAYMENT', occurred_at__gt=latest.computed_at,
+        ).values(BILLING_DAY, LOAN_TYPE).annotate(principal_delta=Sum('principal_delta'))
+        for row in repaid:
+            group = group_for((row[BILLING_DAY], row[LOAN_TYPE]))
+            group['outstanding_principal'] += row['principal_delta'] or 0
+
+    for group in groups.values():
+        group['stopped_ratio'] = (
+            round(group['stopped_count'] / group['loan_count'], 4) if group['loan_count'] else 0.0
+        )
+
+    return {
+        'snapshot_date': str(latest.snapshot_date),
+        'computed_at': latest.computed_at.isoformat(),
+        'groups': sorted(groups.values(), key=lambda group: (group['billing_day'], group['loan_type'])),
+    }
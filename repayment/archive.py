@@ -0,0 +1,196 @@
+import datetime
+import gzip
+import heapq
+import itertools
+import json
+import os
+import uuid
+from operator import itemgetter
+from pathlib import Path
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from credit_card_service.sharding import shard_aliases, shard_for_loan
+
+FIELDS = ('transaction_id', 'loan_id', 'amount', 'created', 'reference', 'change_seq')
+
+
+def month_start(value):
+    return value.replace(day=1)
+
+
+def next_month(month):
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def month_bounds(month):
+    """Returns the aware [start, end) datetimes of a month."""
+    start = timezone.make_aware(datetime.datetime.combine(month, datetime.time.min))
+    end = timezone.make_aware(datetime.datetime.combine(next_month(month), datetime.time.min))
+    return start, end
+
+
+def segment_path(month, shard='default'):
+    archive_dir = Path(settings.TRANSACTION_ARCHIVE_DIR)
+    if shard != 'default':
+        archive_dir = archive_dir / shard
+    return archive_dir / f"{month:%Y-%m}.jsonl.gz"
+
+
+def encode_row(row):
+    return json.dumps({
+        'transaction_id': str(row['transaction_id']),
+        'loan_id': str(row['loan_id']),
+        'amount': row['amount'],
+        'created': row['created'].isoformat(),
+        'reference': row['reference'],
+        'change_seq': row['change_seq'],
+    })
+
+
+def decode_row(line):
+    """Decodes an archived row like Transaction.values(*FIELDS)."""
+    row = json.loads(line)
+    return {
+        'transaction_id': uuid.UUID(row['transaction_id']),
+        'loan_id': uuid.UUID(row['loan_id']),
+        'amount': row['amount'],
+        'created': datetime.datetime.fromisoformat(row['created']),
+        # Absent from rows archived before they were kept
+        'reference': row.get('reference'),
+        'change_seq': row.get('change_seq', 0),
+    }
+
+
+def read_segment(path):
+    """Streams the rows of an archive segment."""
+    with gzip.open(path, 'rt') as segment:
+        for line in segment:
+            yield decode_row(line)
+
+
+def read_member(path, offset, length):
+    """Returns the rows of the one gzip member of a segment at `offset`, which holds one loan's rows."""
+    with open(path, 'rb') as segment:
+        segment.seek(offset)
+        data = gzip.decompress(segment.read(length))
+    return [decode_row(line) for line in data.decode().splitlines()]
+
+
+segment_order = itemgetter('loan_id', 'created')
+
+
+def archive_month(month, shard='default'):
+    """
+    Moves one month of a shard's hot transactions into its segment file.
+    Each loan's rows are written as a gzip member of their own, indexed by a
+    TransactionArchiveEntry, so a statement reads only the loan's members.
+    Rows already in the segment (from an earlier, interrupted run or an
+    unindexed segment) are kept once. Settlement references of the moved rows
+    are kept in ArchivedTransactionReference, so they are never ingested again.
+    """
+    from repayment.models import (
+        ArchivedTransactionReference, Transaction, TransactionArchiveEntry, TransactionArchiveSegment,
+    )
+
+    start, end = month_bounds(month)
+    hot = Transaction.objects.using(shard).filter(created__gte=start, created__lt=end)
+    path = segment_path(month, shard)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+
+    existing = sorted(read_segment(path), key=segment_order) if path.exists() else []
+    seen = {row['transaction_id'] for row in existing}
+    fresh = (
+        row for row in hot.order_by('loan_id', 'created').values(*FIELDS).iterator(chunk_size=5000)
+        if row['transaction_id'] not in seen
+    )
+    row_count = 0
+    entries, references = [], []
+    with open(tmp_path, 'wb') as segment:
+        for loan_id, rows in itertools.groupby(heapq.merge(existing, fresh, key=segment_order), key=itemgetter('loan_id')):
+            rows = list(rows)
+            references += [
+                ArchivedTransactionReference(reference=row['reference'], loan_id=loan_id, transaction_id=row['transaction_id'])
+                for row in rows if row['reference']
+            ]
+            lines = [encode_row(row) + '\n' for row in rows]
+            member = gzip.compress(''.join(lines).encode())
+            entries.append(TransactionArchiveEntry(loan_id=loan_id, month=month, offset=segment.tell(), length=len(member)))
+            segment.write(member)
+            row_count += len(lines)
+    os.replace(tmp_path, path)
+
+    # Rows are only deleted once the segment holding them is on disk.
+    with transaction.atomic(using=shard), transaction.atomic():
+        ArchivedTransactionReference.objects.using(shard).bulk_create(references, batch_size=5000, ignore_conflicts=True)
+        deleted, _ = hot.delete()
+        TransactionArchiveEntry.objects.using(shard).filter(month=month).delete()
+        TransactionArchiveEntry.objects.using(shard).bulk_create(entries, batch_size=5000)
+        TransactionArchiveSegment.objects.update_or_create(
+            month=month, shard=shard, defaults={'path': str(path), 'row_count': row_count, 'indexed': True},
+        )
+    return deleted
+
+
+def archive_transactions(retention_days=None):
+    """
+    Archives every whole month of transactions older than the retention window, shard by shard.
+    Returns the number of rows moved out of the hot tables.
+    """
+    from repayment.models import Transaction, TransactionArchiveSegment
+
+    if retention_days is None:
+        retention_days = settings.TRANSACTION_RETENTION_DAYS
+    cutoff = timezone.localdate() - datetime.timedelta(days=retention_days)
+    cutoff_start, _ = month_bounds(month_start(cutoff))
+
+    archived = 0
+    for shard in shard_aliases():
+        months = set(Transaction.objects.using(shard).filter(created__lt=cutoff_start).dates('created', 'month'))
+        # Segments written before they were indexed are rewritten with an index
+        months.update(TransactionArchiveSegment.objects.filter(shard=shard, indexed=False).values_list('month', flat=True))
+        archived += sum(archive_month(month, shard) for month in sorted(months))
+    return archived
+
+
+def get_loan_transactions(loan_id, since=None):
+    """
+    Returns a loan's transactions, newest first, from the hot table and the
+    loan's members of the archive segments that can hold rows after `since`.
+    """
+    from repayment.models import Transaction, TransactionArchiveEntry, TransactionArchiveSegment
+
+    loan_id = uuid.UUID(str(loan_id))
+    shard = shard_for_loan(loan_id)
+    hot = Transaction.objects.using(shard).filter(loan_id=loan_id)
+    entries = TransactionArchiveEntry.objects.using(shard).filter(loan_id=loan_id)
+    segments = TransactionArchiveSegment.objects.filter(shard=shard)
+    if since is not None:
+        hot = hot.filter(created__gte=since)
+        since_month = month_start(timezone.localdate(since))
+        entries = entries.filter(month__gte=since_month)
+        segments = segments.filter(month__gte=since_month)
+
+    rows = list(hot.values(*FIELDS))
+    archived = []
+    entries = list(entries.values_list('month', 'offset', 'length'))
+    if entries:
+        paths = dict(segments.filter(indexed=True, month__in=[month for month, _, _ in entries]).values_list('month', 'path'))
+        for month, offset, length in entries:
+            if month in paths:
+                archived += read_member(paths[month], offset, length)
+    # Segments archived before they were indexed are scanned until they are rewritten
+    for segment in segments.filter(indexed=False):
+        archived += (row for row in read_segment(segment.path) if row['loan_id'] == loan_id)
+
+    seen = {row['transaction_id'] for row in rows}
+    for row in archived:
+        if row['transaction_id'] in seen:
+            continue
+        if since is not None and row['created'] < since:
+            continue
+        rows.append(row)
+
+    rows.sort(key=lambda row: row['created'], reverse=True)
+    return rows
@@ -0,0 +1,142 @@
+"""
+Change feed for incremental sync of loans, payments and transactions.
+
+Every write to a Loan, Payment or Transaction row stamps its change_seq with
+a number taken from the ChangeSequence counter of the row's database. A
+write transaction takes its number before it locks or writes any of those
+rows, and the counter row stays locked until it commits, so on each shard
+numbers are committed in increasing order: once a reader sees a number, no
+smaller one can show up later. Rows written together by one transaction (a
+settlement chunk, an accrual batch) share its number.
+
+The cost is that write transactions on a shard run one at a time from the
+moment they take their number until they commit: a payment waits behind a
+whole settlement chunk or accrual batch on its shard, so the shard's write
+throughput is that of a single writer, whatever its connection count.
+SETTLEMENT_CHUNK_SIZE and INTEREST_ACCRUAL_BATCH_SIZE bound how long such a
+wait lasts; more shards are the way to more concurrent writers.
+
+The feed reads each table of each shard in (change_seq, primary key) order
+from the position in the cursor, using the index on those columns, so a sync
+costs one range scan per table over the rows changed since the last one. A
+row changed several times between syncs is returned once, as it is now.
+Rows written before the feed existed have change_seq 0 and are returned by
+a sync that starts from the beginning. Transactions moved to the archive
+(repayment.archive) are not in the feed; archiving does not change them.
+"""
+import base64
+import binascii
+import json
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.db.models import Q
+from django.db.transaction import TransactionManagementError
+from credit_card_service.sharding import shard_aliases
+
+FEEDS = {
+    'loans': 'user.Loan',
+    'payments': 'repayment.Payment',
+    'transactions': 'repayment.Transaction',
+}
+
+
+def next_sequence(using):
+    """Takes the next change sequence number on `using`, in the caller's transaction."""
+    from repayment.models import ChangeSequence
+
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        raise TransactionManagementError('Change sequence numbers must be taken inside a transaction.')
+    # Plain SQL: this runs in every write transaction, and the ORM would compile both statements each time.
+    table = connection.ops.quote_name(ChangeSequence._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'UPDATE {table} SET value = value + 1 WHERE id = 1')
+        if not cursor.rowcount:
+            ChangeSequence.objects.using(using).get_or_create(pk=1)
+            cursor.execute(f'UPDATE {table} SET value = value + 1 WHERE id = 1')
+        cursor.execute(f'SELECT value FROM {table} WHERE id = 1')
+        return cursor.fetchone()[0]
+
+
+class ChangeTracked:
+    """
+    Model mixin stamping change_seq on every save, with a new sequence number
+    or with the `change_seq` the caller already took in its transaction.
+    """
+
+    def save(self, *args, change_seq=None, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            self.change_seq = change_seq or next_sequence(using)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = [*kwargs['update_fields'], 'change_seq']
+            super().save(*args, **kwargs)
+
+
+def encode_cursor(positions):
+    return base64.urlsafe_b64encode(json.dumps(positions, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns {alias: {feed: [change_seq, pk]}} from a cursor. Raises ValueError for a malformed one."""
+    if not cursor:
+        return {}
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError('Malformed cursor.')
+    if not isinstance(positions, dict) or not all(
+        isinstance(feeds, dict) and all(
+            name in FEEDS and isinstance(position, list) and len(position) == 2
+            and isinstance(position[0], int) and isinstance(position[1], str)
+            for name, position in feeds.items()
+        )
+        for feeds in positions.values()
+    ):
+        raise ValueError('Malformed cursor.')
+    for feeds in positions.values():
+        for name, position in feeds.items():
+            try:
+                apps.get_model(FEEDS[name])._meta.pk.to_python(position[1])
+            except ValidationError:
+                raise ValueError('Malformed cursor.')
+    return positions
+
+
+def changed_after(model, using, position):
+    """The rows of `model` on `using` after `position` ([change_seq, pk], or None for all), in feed order."""
+    rows = model.objects.using(using).order_by('change_seq', 'pk')
+    if position is None:
+        return rows
+    change_seq, pk = position
+    return rows.filter(Q(change_seq__gt=change_seq) | Q(pk__gt=pk), change_seq__gte=change_seq)
+
+
+def changes_since(cursor, limit):
+    """
+    Returns a page of at most `limit` rows changed after `cursor` (from the beginning when empty),
+    grouped by feed, with the cursor of the next page and whether more rows are waiting.
+    """
+    from repayment.serializers import RowEncoder
+
+    positions = decode_cursor(cursor)
+    page = {name: [] for name in FEEDS}
+    remaining, more = limit, False
+    for using in shard_aliases():
+        shard_positions = positions.setdefault(using, {})
+        for name, label in FEEDS.items():
+            if not remaining:
+                more = True
+                break
+            model = apps.get_model(label)
+            encoder = RowEncoder(model)
+            rows = list(encoder.encode(changed_after(model, using, shard_positions.get(name))[:remaining + 1]))
+            if len(rows) > remaining:
+                more = True
+                rows = rows[:remaining]
+            if rows:
+                shard_positions[name] = [rows[-1]['change_seq'], rows[-1][model._meta.pk.name]]
+                page[name] += rows
+                remaining -= len(rows)
+    return {'cursor': encode_cursor(positions), 'has_more': more, **page}
@@ -0,0 +1,106 @@
+"""
+Cash-flow forecast for the whole loan book.
+
+The ACTIVE book is loaded into numpy arrays (principal, rate, remaining
+installments) a chunk at a time and projected over the next N billing
+cycles as a loans x months matrix, one vectorized step per month. Each
+installment repays an equal share of the balance (as in emi_split) plus the
+cycle's interest. Scenario knobs are monthly rates: `prepayment_rate` of the
+remaining balance is repaid early and `stop_rate` of the performing balance
+goes STOPPED and stops paying.
+
+Amounts are expected values, so they are kept as float64 paise and only
+rounded to rupees in the monthly totals. numpy is imported lazily.
+"""
+from repayment import money
+
+CHUNK_SIZE = 100000
+CYCLE_DAYS = 30
+OPEN_STATUSES = ('DUE', 'PARTIALLY_COMPLETED', 'NOT_DUE')
+FORECAST_FIELDS = ('collections', 'interest', 'principal', 'prepayments', 'stopped', 'closing_balance')
+
+
+def iter_book_chunks(chunk_size=CHUNK_SIZE):
+    """
+    Yields (principal_paise, annual_rate_bp, remaining) arrays for every ACTIVE loan, shard by shard.
+    `remaining` is the number of open installments, or the term for loans not yet scheduled.
+    """
+    from credit_card_service.sharding import shard_aliases
+    for shard in shard_aliases():
+        yield from _iter_shard_chunks(shard, chunk_size)
+
+
+def _iter_shard_chunks(shard, chunk_size):
+    import numpy as np
+    from django.db.models import Count, Q
+    from user.models import Loan
+
+    queryset = Loan.objects.using(shard).filter(loan_status='ACTIVE', principal_balance__gt=0).order_by('loan_id').annotate(
+        remaining=Count('payment', filter=Q(payment__status__in=OPEN_STATUSES)),
+    ).values_list('loan_id', 'principal_balance', 'interest_rate', 'term_period', 'remaining')
+    last_id = None
+
+    while True:
+        page = queryset if last_id is None else queryset.filter(loan_id__gt=last_id)
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+        count = len(rows)
+        principal = np.fromiter((row[1] for row in rows), dtype=np.float64, count=count) * money.PAISE_PER_RUPEE
+        rate_bp = np.fromiter((money.rate_bp(row[2]) for row in rows), dtype=np.int64, count=count)
+        remaining = np.fromiter((row[4] or row[3] for row in rows), dtype=np.int64, count=count)
+        yield principal, rate_bp, np.maximum(remaining, 1)
+        last_id = rows[-1][0]
+
+
+def project(principal, rate_bp, remaining, months, prepayment_rate=0.0, stop_rate=0.0, cycle_days=CYCLE_DAYS):
+    """
+    Projects `months` billing cycles for the given loans.
+    Returns {field: (loans, months) array in paise} for every FORECAST_FIELDS entry.
+    """
+    import numpy as np
+
+    balance = np.asarray(principal, dtype=np.float64).copy()
+    remaining = np.asarray(remaining, dtype=np.int64).copy()
+    cycle_rate = np.asarray(rate_bp, dtype=np.float64) * cycle_days / (money.BASIS_POINTS * money.DAYS_PER_YEAR)
+
+    # Filled one contiguous row per month, handed back transposed to (loans, months).
+    result = {field: np.empty((months, balance.shape[0])) for field in FORECAST_FIELDS}
+    for month in range(months):
+        stopped = balance * stop_rate
+        performing = balance - stopped
+        interest = performing * cycle_rate
+        principal_part = np.divide(performing, remaining, out=np.zeros_like(performing), where=remaining > 0)
+        after = performing - principal_part
+        prepaid = after * prepayment_rate
+        balance = after - prepaid
+        remaining = np.maximum(remaining - 1, 0)
+
+        result['interest'][month] = interest
+        result['principal'][month] = principal_part
+        result['prepayments'][month] = prepaid
+        result['collections'][month] = interest + principal_part + prepaid
+        result['stopped'][month] = stopped
+        result['closing_balance'][month] = balance
+    return {field: matrix.T for field, matrix in result.items()}
+
+
+def forecast_book(months=12, prepayment_rate=0.0, stop_rate=0.0, chunk_size=CHUNK_SIZE):
+    """
+    Projects the whole ACTIVE book. Returns (loan count, rows) with one row per
+    future billing cycle, {'month': n, field: rupees, ...}, summed over all loans.
+    """
+    import numpy as np
+
+    totals = {field: np.zeros(months) for field in FORECAST_FIELDS}
+    loans = 0
+    for principal, rate_bp, remaining in iter_book_chunks(chunk_size):
+        projected = project(principal, rate_bp, remaining, months, prepayment_rate, stop_rate)
+        for field in FORECAST_FIELDS:
+            totals[field] += projected[field].sum(axis=0)
+        loans += principal.shape[0]
+
+    return loans, [
+        {'month': month + 1, **{field: int(round(totals[field][month] / money.PAISE_PER_RUPEE)) for field in FORECAST_FIELDS}}
+        for month in range(months)
+    ]
@@ -0,0 +1,124 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+from credit_card_service.throttling import ClientRateThrottle
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+LOCK_TIMEOUT = 30  # Seconds a duplicate waits for the first request before giving up
+POLL_INTERVAL = 0.05
+
+
+def _cache_key(request, key):
+    # Scoped by client, so a key reused by another client never gets this client's response
+    client = ClientRateThrottle().get_ident(request)
+    digest = hashlib.sha256(f'{client}:{request.path}:{key}'.encode()).hexdigest()
+    return f'idempotency:{digest}'
+
+
+def _body_digest(request):
+    return hashlib.sha256(request.body).hexdigest()
+
+
+def _replay(stored, body_digest):
+    status_code, data, headers, stored_digest = stored
+    if body_digest != stored_digest:
+        return Response(
+            data={"error": "This Idempotency-Key was already used with a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(data=data, status=status_code, headers={**headers, 'Idempotent-Replayed': 'true'})
+
+
+class Replayed(Exception):
+    """Ends a request early with the response stored for its Idempotency-Key."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class IdempotentMixin:
+    """
+    APIView mixin replaying the stored response when a write request is
+    retried with the same Idempotency-Key header by the same client.
+
+    Responses, with their headers and a hash of the request body, are kept in
+    the IDEMPOTENCY_CACHE for IDEMPOTENCY_KEY_TTL seconds; 5xx and 429
+    responses are not kept. A retry whose body differs from the stored one
+    gets 422 instead of the stored response. While the first request runs,
+    duplicates wait for its response instead of doing the work again.
+
+    The lookup runs ahead of the throttles, and the handler's concurrency
+    gate is only entered by the request doing the work, so a retry of a
+    finished request always gets its response back and waiting duplicates
+    neither spend rate limit tokens nor hold a gate slot.
+    """
+    idempotent_methods = ('POST',)
+    idempotency_lock = None
+
+    def check_throttles(self, request):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if key and request.method in self.idempotent_methods:
+            self.claim_idempotency_key(request, key)
+        super().check_throttles(request)
+
+    def claim_idempotency_key(self, request, key):
+        """Raises Replayed with the stored response, or takes the key's lock for this request."""
+        cache = caches[settings.IDEMPOTENCY_CACHE]
+        cache_key = _cache_key(request, key)
+        body_digest = _body_digest(request)
+        lock_key = cache_key + ':lock'
+
+        stored = cache.get(cache_key)
+        if stored is not None:
+            raise Replayed(_replay(stored, body_digest))
+
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            deadline = time.monotonic() + LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                stored = cache.get(cache_key)
+                if stored is not None:
+                    raise Replayed(_replay(stored, body_digest))
+                if cache.get(lock_key) is None:
+                    break
+            raise Replayed(Response(
+                data={"error": "A request with this Idempotency-Key did not finish in time. Please retry."},
+                status=status.HTTP_409_CONFLICT,
+            ))
+        self.idempotency_lock = (cache_key, lock_key, body_digest)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Replayed):
+            return exc.response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            # Unhandled errors skip finalize_response; the retry may run the request again.
+            self.release_idempotency_key()
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        self.release_idempotency_key(response)
+        return response
+
+    def release_idempotency_key(self, response=None):
+        """Stores `response` for the key this request holds, if any and if it is kept, and frees the key."""
+        if self.idempotency_lock is None:
+            return
+        cache = caches[settings.IDEMPOTENCY_CACHE]
+        cache_key, lock_key, body_digest = self.idempotency_lock
+        self.idempotency_lock = None
+        try:
+            # Server errors and 429s (rate or velocity limited) are not stored so that the client can retry them.
+            if response is not None and response.status_code < 500 \
+                    and response.status_code != status.HTTP_429_TOO_MANY_REQUESTS:
+                headers = {name: value for name, value in response.items() if name != 'Content-Type'}
+                stored = (response.status_code, response.data, headers, body_digest)
+                cache.set(cache_key, stored, settings.IDEMPOTENCY_KEY_TTL)
+        finally:
+            cache.delete(lock_key)
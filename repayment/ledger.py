@@ -0,0 +1,164 @@
+"""
+Event-sourced loan ledger.
+
+Every change to a loan's balances is appended as a LoanEvent with the next
+per-loan sequence number; events are never updated. Every
+LEDGER_SNAPSHOT_EVERY events the running balances are saved as a
+LoanBalanceSnapshot, so the balance at any point in time is one snapshot
+read plus a replay of at most that many events. Loan.principal_balance and
+Loan.accrued_interest are kept as the current-state projections the rest of
+the app reads. Principal and amounts paid are in rupees; interest is in
+paise, as accrued nightly (INTEREST events) and settled by payments.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from credit_card_service.sharding import shard_for_loan
+
+EMPTY_BALANCE = {'sequence': 0, 'occurred_at': None, 'principal': 0, 'interest': 0, 'paid': 0}
+
+
+def apply_event(balance, event):
+    """Returns the balances after `event`, a LoanEvent values() dict."""
+    return {
+        'sequence': event['sequence'],
+        'occurred_at': event['occurred_at'],
+        'principal': balance['principal'] + event['principal_delta'],
+        'interest': balance['interest'] + event['interest_delta'],
+        'paid': balance['paid'] + (event['amount'] if event['kind'] == 'PAYMENT' else 0),
+    }
+
+
+def _snapshot_before(loan_id, using, at=None, sequence=None):
+    from repayment.models import LoanBalanceSnapshot
+
+    snapshots = LoanBalanceSnapshot.objects.using(using).filter(loan_id=loan_id)
+    if at is not None:
+        snapshots = snapshots.filter(occurred_at__lte=at)
+    if sequence is not None:
+        snapshots = snapshots.filter(sequence__lte=sequence)
+    snapshot = snapshots.order_by('-sequence').values(*EMPTY_BALANCE).first()
+    return snapshot or dict(EMPTY_BALANCE)
+
+
+def _tail(loan_id, using, after_sequence, at=None):
+    from repayment.models import LoanEvent
+
+    events = LoanEvent.objects.using(using).filter(loan_id=loan_id, sequence__gt=after_sequence)
+    if at is not None:
+        events = events.filter(occurred_at__lte=at)
+    return events.order_by('sequence').values(
+        'sequence', 'kind', 'amount', 'principal_delta', 'interest_delta', 'data', 'occurred_at',
+    )
+
+
+def balance_at(loan_id, at=None):
+    """
+    A loan's balances ({'sequence', 'occurred_at', 'principal', 'interest', 'paid'})
+    after every event up to `at` (now by default).
+    """
+    using = shard_for_loan(loan_id)
+    balance = _snapshot_before(loan_id, using, at)
+    for event in _tail(loan_id, using, balance['sequence'], at):
+        balance = apply_event(balance, event)
+    return balance
+
+
+def statement(loan_id, since=None, until=None):
+    """
+    Rebuilds a loan's statement between `since` and `until`: the opening balances
+    and every event in the window with the balances after it.
+    """
+    using = shard_for_loan(loan_id)
+    opening = balance_at(loan_id, since) if since is not None else dict(EMPTY_BALANCE)
+    balance = opening
+    lines = []
+    for event in _tail(loan_id, using, opening['sequence'], until):
+        balance = apply_event(balance, event)
+        lines.append({**event, 'balance': balance})
+    return {'opening': opening, 'lines': lines, 'closing': balance}
+
+
+def record_event(loan, kind, amount=0, principal_delta=0, interest_delta=0, data=None):
+    """
+    Appends an event to `loan`'s ledger, in the caller's transaction on the loan's shard,
+    and writes a balance snapshot when the sequence reaches a multiple of LEDGER_SNAPSHOT_EVERY.
+    """
+    from user.models import Loan
+    from repayment.models import LoanEvent
+
+    using = loan._state.db or shard_for_loan(loan.loan_id)
+    with transaction.atomic(using=using):
+        # Serializes appends to one loan's ledger, so sequence numbers never collide.
+        Loan.objects.using(using).select_for_update().filter(loan_id=loan.loan_id).exists()
+        last_sequence, last_occurred_at = LoanEvent.objects.using(using).filter(
+            loan_id=loan.loan_id,
+        ).order_by('-sequence').values_list('sequence', 'occurred_at').first() or (0, None)
+        now = timezone.now()
+        event = LoanEvent.objects.using(using).create(
+            loan_id=loan.loan_id,
+            sequence=last_sequence + 1,
+            kind=kind,
+            amount=amount,
+            principal_delta=principal_delta,
+            interest_delta=interest_delta,
+            data=data or {},
+            # Kept in sequence order, which point-in-time lookups rely on
+            occurred_at=max(now, last_occurred_at) if last_occurred_at else now,
+        )
+
+        if event.sequence % settings.LEDGER_SNAPSHOT_EVERY == 0:
+            _write_snapshot(loan.loan_id, using, event.sequence)
+    return event
+
+
+def disbursement_event(loan):
+    """
+    The unsaved DISBURSEMENT event opening `loan`'s ledger with its principal. Loan.save
+    records it; code creating loans with bulk_create passes these to record_events.
+    """
+    from repayment.models import LoanEvent
+
+    return LoanEvent(
+        loan_id=loan.loan_id, kind='DISBURSEMENT', amount=loan.loan_amount, principal_delta=loan.principal_balance,
+    )
+
+
+def record_events(events, using):
+    """
+    Appends unsaved LoanEvents (sequence and occurred_at left unset) for many loans on one shard,
+    with one query for the current sequences and one bulk insert, writing snapshots as
+    record_event does. The caller must hold the row locks of the loans, in a transaction on `using`.
+    """
+    from django.db.models import Max
+    from repayment.models import LoanEvent
+
+    last = {
+        row['loan_id']: (row['sequence'], row['occurred_at'])
+        for row in LoanEvent.objects.using(using).filter(
+            loan_id__in={event.loan_id for event in events},
+        ).order_by().values('loan_id').annotate(sequence=Max('sequence'), occurred_at=Max('occurred_at'))
+    }
+    now = timezone.now()
+    for event in events:
+        last_sequence, last_occurred_at = last.get(event.loan_id, (0, None))
+        event.sequence = last_sequence + 1
+        event.occurred_at = max(now, last_occurred_at) if last_occurred_at else now
+        last[event.loan_id] = (event.sequence, event.occurred_at)
+    LoanEvent.objects.using(using).bulk_create(events, batch_size=1000)
+
+    for event in events:
+        if event.sequence % settings.LEDGER_SNAPSHOT_EVERY == 0:
+            _write_snapshot(event.loan_id, using, event.sequence)
+    return events
+
+
+def _write_snapshot(loan_id, using, sequence):
+    from repayment.models import LoanBalanceSnapshot
+
+    balance = _snapshot_before(loan_id, using, sequence=sequence)
+    for tail_event in _tail(loan_id, using, balance['sequence']):
+        if tail_event['sequence'] > sequence:
+            break
+        balance = apply_event(balance, tail_event)
+    LoanBalanceSnapshot.objects.using(using).create(loan_id=loan_id, **balance)
@@ -0,0 +1,20 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from repayment.accrual import accrue_interest
+
+
+class Command(BaseCommand):
+    help = "Accrues daily interest on every ACTIVE loan through a date (yesterday by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=datetime.date.fromisoformat, default=None, help="Accrue through this day.")
+        parser.add_argument("--batch-size", type=int, default=settings.INTEREST_ACCRUAL_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        accrued = accrue_interest(options["date"], options["batch_size"])
+        self.stdout.write(f"loans accrued={accrued} in {time.perf_counter() - started:.2f}s")
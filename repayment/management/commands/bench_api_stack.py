@@ -0,0 +1,69 @@
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test.client import FakePayload, RequestFactory
+from django.test.utils import override_settings
+
+LEAN_MIDDLEWARE = "credit_card_service.lean_api.LeanAPIMiddleware"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the per-request cost of the JSON API calls through the full middleware and DRF "
+        "stack and through the lean API path, on Django's WSGI handler. The calls are rejected by "
+        "validation before they touch the database, so the difference is the stack overhead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint per round.")
+        parser.add_argument("--rounds", type=int, default=5, help="Best round is reported.")
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        calls = {
+            # Malformed loan id: 400 before any query
+            "make-payment": ("POST", "/api/make-payment/", {"loan_id": "not-a-uuid", "amount": 100}),
+            # Missing fields: 400 before any query
+            "register-user": ("POST", "/api/register-user/", {"name": "bench"}),
+            # Malformed timestamp: 400 before any query
+            "loan-ledger": ("GET", f"/api/loan-ledger/?loan_id={uuid.uuid4()}&at=nope", None),
+        }
+        full_middleware = [name for name in settings.MIDDLEWARE if name != LEAN_MIDDLEWARE]
+        lean_middleware = list(dict.fromkeys([full_middleware[0], LEAN_MIDDLEWARE, *full_middleware]))
+        # The limiters are lifted so every call reaches the view.
+        unlimited = {scope: {"capacity": 10 ** 9, "per_second": 10 ** 9} for scope in settings.RATE_LIMITS}
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+
+        handlers = {}
+        for stack, middleware in (("full", full_middleware), ("lean", lean_middleware)):
+            with override_settings(MIDDLEWARE=middleware):
+                handlers[stack] = WSGIHandler()
+
+        def start_response(status, headers):
+            statuses.append(status)
+
+        self.stdout.write(f"requests={options['requests']} rounds={options['rounds']} (best round per stack)")
+        self.stdout.write(f"{'endpoint':<14} {'full us':>9} {'lean us':>9} {'saved us':>9}  status")
+        for name, (method, path, body) in calls.items():
+            payload = b"" if body is None else json.dumps(body).encode()
+            request = factory.generic(method, path, payload, content_type="application/json", HTTP_ACCEPT="application/json")
+            best = {}
+            statuses = []
+            with override_settings(RATE_LIMITS=unlimited, ALLOWED_HOSTS=["testserver"]):
+                # Rounds alternate between the stacks so that drift affects both alike.
+                for _ in range(options["rounds"]):
+                    for stack, handler in handlers.items():
+                        environs = [{**request.environ, "wsgi.input": FakePayload(payload)} for _ in range(options["requests"])]
+                        started = time.perf_counter()
+                        for environ in environs:
+                            handler(environ, start_response).close()
+                        elapsed = (time.perf_counter() - started) / options["requests"] * 1e6
+                        best[stack] = min(best.get(stack, elapsed), elapsed)
+            self.stdout.write(
+                f"{name:<14} {best['full']:>9.1f} {best['lean']:>9.1f} {best['full'] - best['lean']:>9.1f}  {statuses[-1]}"
+            )
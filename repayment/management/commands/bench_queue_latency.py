@@ -0,0 +1,93 @@
+import statistics
+import threading
+import time
+
+from celery import Celery
+from celery.contrib.testing.worker import start_worker
+from django.core.management.base import BaseCommand
+
+from credit_card_service.celery import app
+
+# Embedded workers on an in-memory broker, configured with the same queue
+# topology as the real app so the routes under test are the production ones.
+bench_app = Celery("bench_queue_latency", broker="memory://", backend="cache+memory://")
+bench_app.conf.update(
+    task_queues=app.conf.task_queues,
+    task_default_queue=app.conf.task_default_queue,
+    task_acks_late=app.conf.task_acks_late,
+    task_ignore_result=True,
+    broker_transport_options={"polling_interval": 0.005},
+)
+
+LATENCIES = []
+LATENCIES_LOCK = threading.Lock()
+
+
+@bench_app.task(name="bench.batch_job")
+def batch_job(duration):
+    time.sleep(duration)
+
+
+@bench_app.task(name="bench.interactive_job")
+def interactive_job(sent_at):
+    with LATENCIES_LOCK:
+        LATENCIES.append(time.perf_counter() - sent_at)
+
+
+def queue_for(task_name):
+    return app.amqp.router.route({}, task_name)["queue"].name
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures interactive task latency while a billing run floods the batch queue, "
+        "using embedded workers on an in-memory broker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--billing-tasks", type=int, default=200)
+        parser.add_argument("--billing-task-ms", type=float, default=5.0)
+        parser.add_argument("--interactive-tasks", type=int, default=50)
+        parser.add_argument(
+            "--shared-queue", action="store_true",
+            help="Send everything to one queue, as before the queue split, for comparison.",
+        )
+
+    def handle(self, *args, **options):
+        interactive = queue_for("repayment.tasks.update_next_emis")
+        batch = queue_for("repayment.tasks.billing_queue")
+        if options["shared_queue"]:
+            interactive = batch
+
+        with start_worker(bench_app, queues=[interactive], perform_ping_check=False), \
+                start_worker(bench_app, queues=[batch], perform_ping_check=False):
+            idle = self.measure(options, interactive, batch, with_billing=False)
+            busy = self.measure(options, interactive, batch, with_billing=True)
+
+        self.report(f"interactive latency on '{interactive}', idle", idle)
+        self.report(f"interactive latency on '{interactive}', during billing on '{batch}'", busy)
+
+    def measure(self, options, interactive, batch, with_billing):
+        LATENCIES.clear()
+        if with_billing:
+            for _ in range(options["billing_tasks"]):
+                batch_job.apply_async((options["billing_task_ms"] / 1000,), queue=batch)
+
+        for _ in range(options["interactive_tasks"]):
+            interactive_job.apply_async((time.perf_counter(),), queue=interactive)
+            time.sleep(0.005)
+
+        deadline = time.monotonic() + 60
+        while len(LATENCIES) < options["interactive_tasks"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return sorted(LATENCIES)
+
+    def report(self, label, latencies):
+        if not latencies:
+            self.stdout.write(f"{label}: no tasks completed")
+            return
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f"{label}: n={len(latencies)} "
+            f"p50={statistics.median(latencies) * 1000:.2f}ms p95={p95 * 1000:.2f}ms"
+        )
@@ -0,0 +1,124 @@
+import datetime
+import time
+import tracemalloc
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from credit_card_service.rendering import stream_page
+from repayment.views import PAYMENT_ROW_SAFE, TRANSACTION_ROW_SAFE
+
+
+def legacy_statement(rows):
+    """The statement table as it was built before templates: one f-string per row."""
+    html_content = """
+        <!DOCTYPE html>
+        <html lang="en">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>Loan Account Statement</title>
+            <style>
+                body { font-family: Arial, sans-serif; background-color: #f9f9f9; color: #333; padding: 20px; }
+                h1 { text-align: center; color: #4CAF50; margin-bottom: 20px; }
+                table { width: 90%; margin: 0 auto; border-collapse: collapse; }
+                th, td { border: 1px solid #ddd; padding: 10px; text-align: center; }
+                th { background-color: #4CAF50; color: white; }
+                tr:nth-child(even) { background-color: #f2f2f2; }
+                tr:hover { background-color: #ddd; }
+            </style>
+        </head>
+        <body>
+            <h1>Loan Account Statement</h1>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Payment ID</th>
+                        <th>Loan ID</th>
+                        <th>EMI Amount</th>
+                        <th>Total Paid</th>
+                        <th>Status</th>
+                        <th>Due Date</th>
+                    </tr>
+                </thead>
+                <tbody>
+        """
+    for payment in rows:
+        html_content += f"""
+            <tr>
+                <td>{payment['payment_id']}</td>
+                <td>{payment['loan']}</td>
+                <td>{payment['emi_amount']}</td>
+                <td>{payment['total_paid']}</td>
+                <td>{payment['status']}</td>
+                <td>{payment['due_date']}</td>
+            </tr>
+            """
+    html_content += """
+                </tbody>
+            </table>
+        </body>
+        </html>
+        """
+    return html_content
+
+
+def templated_statement(rows):
+    return stream_page("repayment/statement.html", [
+        ("payment_rows", "repayment/statement_payment_row.html", rows, PAYMENT_ROW_SAFE),
+        ("transaction_rows", "repayment/statement_transaction_row.html", [], TRANSACTION_ROW_SAFE),
+    ])
+
+
+class Command(BaseCommand):
+    help = "Compares rendering a large statement with f-string concatenation against the streamed templates."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        loan_id = str(uuid.uuid4())
+        start = datetime.date(2024, 1, 1)
+        rows = [
+            {
+                "payment_id": str(uuid.uuid4()),
+                "loan": loan_id,
+                "emi_amount": 450 + i % 7,
+                "total_paid": i % 450,
+                "status": "NOT_DUE",
+                "due_date": str(start + datetime.timedelta(days=i)),
+            }
+            for i in range(options["rows"])
+        ]
+
+        # Warm the template cache so compilation is not part of the measurement.
+        "".join(templated_statement(rows[:1]))
+
+        legacy = self.best_of(options["repeat"], lambda: legacy_statement(rows))
+        # Time to the last byte: every chunk is produced, as the server would send them.
+        templated = self.best_of(options["repeat"], lambda: [None for _ in templated_statement(rows)])
+
+        legacy_peak = self.peak_memory(lambda: legacy_statement(rows))
+        streamed_peak = self.peak_memory(lambda: [None for _ in templated_statement(rows)])
+
+        self.stdout.write(f"rows={options['rows']}")
+        self.stdout.write(f"f-string concatenation: {legacy * 1000:.1f}ms, peak {legacy_peak / 1024:.0f}KiB")
+        self.stdout.write(
+            f"streamed templates (last byte): {templated * 1000:.1f}ms, peak {streamed_peak / 1024:.0f}KiB"
+        )
+
+    def best_of(self, repeat, fn):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    def peak_memory(self, fn):
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
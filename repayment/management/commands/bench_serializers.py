@@ -0,0 +1,61 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from repayment.models import Payment
+from repayment.serializers import PaymentSerializer, payment_encoder
+from user.models import User, Loan
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares PaymentSerializer with the values_list() row encoder on a loan with many payments. "
+        "The sample rows are created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            payments = self.sample_payments(options["rows"])
+
+            drf = self.best_of(options["repeat"], lambda: PaymentSerializer(payments, many=True).data)
+            fast = self.best_of(options["repeat"], lambda: list(payment_encoder.encode(payments)))
+
+            expected = [dict(row) for row in PaymentSerializer(payments, many=True).data]
+            if expected != list(payment_encoder.encode(payments)):
+                raise AssertionError("Row encoder output differs from PaymentSerializer")
+
+            transaction.set_rollback(True)
+
+        rows = options["rows"]
+        self.stdout.write(f"rows={rows}")
+        self.stdout.write(f"PaymentSerializer: {drf * 1000:.1f}ms ({drf / rows * 1e6:.1f}us/row)")
+        self.stdout.write(f"row encoder: {fast * 1000:.1f}ms ({fast / rows * 1e6:.1f}us/row)")
+        self.stdout.write(f"speedup: {drf / fast:.1f}x")
+
+    def sample_payments(self, rows):
+        user = User(name="bench", aadhar_number="000000000000", email="bench@example.com", annual_income=0)
+        User.objects.bulk_create([user])
+        loan = Loan.objects.create(
+            user=user, loan_amount=5000, loan_type="Credit Card", interest_rate=12, term_period=12,
+            disbursement_date=datetime.date(2024, 1, 1), principal_balance=5000,
+        )
+        start = datetime.date(2024, 1, 1)
+        Payment.objects.bulk_create([
+            Payment(loan=loan, emi_amount=450, due_date=start + datetime.timedelta(days=i), status="NOT_DUE")
+            for i in range(rows)
+        ], batch_size=1000)
+        return Payment.objects.filter(loan=loan)
+
+    def best_of(self, repeat, fn):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best
@@ -0,0 +1,63 @@
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from credit_card_service.throttling import ClientRateThrottle, LoanRateThrottle, concurrency_limited
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the per-request overhead of the make-payment limiters (client and loan "
+        "token buckets plus the concurrency gate) and checks that a burst is cut at the bucket size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        throttles = [ClientRateThrottle(), LoanRateThrottle()]
+        handler = concurrency_limited(lambda view, request: None)
+        count = options["requests"]
+        cache = caches[settings.RATE_LIMIT_CACHE]
+
+        def make_request(index):
+            # A distinct client and loan per request, so every check is allowed.
+            body = json.dumps({"loan_id": str(uuid.UUID(int=index)), "amount": 100})
+            request = factory.post(
+                "/api/make-payment/", body, content_type="application/json", REMOTE_ADDR=f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}",
+            )
+            return Request(request)
+
+        requests = [make_request(i) for i in range(count)]
+        started = time.perf_counter()
+        for request in requests:
+            request._request.body
+        baseline = time.perf_counter() - started
+
+        requests = [make_request(i) for i in range(count)]
+        cache.clear()
+        started = time.perf_counter()
+        for request in requests:
+            if all(throttle.allow_request(request, None) for throttle in throttles):
+                handler(None, request)
+        limited = time.perf_counter() - started
+
+        overhead = (limited - baseline) / count
+        self.stdout.write(f"requests={count} cache={settings.CACHES[settings.RATE_LIMIT_CACHE]['BACKEND']}")
+        self.stdout.write(f"limiter overhead: {overhead * 1e6:.1f}us/request")
+
+        cache.clear()
+        capacity = settings.RATE_LIMITS["loan"]["capacity"]
+        burst = [make_request(0) for _ in range(capacity + 5)]
+        allowed = sum(all(throttle.allow_request(request, None) for throttle in throttles) for request in burst)
+        self.stdout.write(
+            f"burst of {len(burst)} on one loan: {allowed} allowed, {len(burst) - allowed} rejected, "
+            f"retry after {throttles[1].wait():.2f}s"
+        )
@@ -0,0 +1,55 @@
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a web worker imports before it can serve its first request.
+WEB_ENTRY_POINT = "from credit_card_service.wsgi import application; import credit_card_service.urls"
+
+
+def parse_importtime(stderr):
+    """Parses `-X importtime` output into {module: (self_us, cumulative_us)}."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports the web entry point in a fresh interpreter with -X importtime and fails "
+        "if it exceeds the import-time budget or pulls in worker-only libraries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget-ms", type=float, default=settings.WEB_IMPORT_TIME_BUDGET_MS)
+        parser.add_argument("--top", type=int, default=10, help="Show the N slowest imports.")
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", WEB_ENTRY_POINT],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Importing the web entry point failed:\n{result.stderr[-2000:]}")
+
+        modules = parse_importtime(result.stderr)
+        total_ms = sum(self_us for self_us, _ in modules.values()) / 1000
+
+        slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:options["top"]]
+        for name, (_, cumulative_us) in slowest:
+            self.stdout.write(f"{cumulative_us / 1000:8.1f}ms  {name}")
+        self.stdout.write(f"total import time: {total_ms:.1f}ms (budget {options['budget_ms']:.0f}ms)")
+
+        forbidden = sorted(
+            name for name in modules
+            if name.split(".")[0] in settings.WEB_FORBIDDEN_IMPORTS and "." not in name
+        )
+        if forbidden:
+            raise CommandError(f"Worker-only modules imported by the web process: {', '.join(forbidden)}")
+        if total_ms > options["budget_ms"]:
+            raise CommandError(f"Web import time {total_ms:.1f}ms exceeds the {options['budget_ms']:.0f}ms budget")
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from repayment.forecast import CHUNK_SIZE, FORECAST_FIELDS, forecast_book, project
+
+
+class Command(BaseCommand):
+    help = (
+        "Projects collections and principal run-off of the ACTIVE loan book over the next "
+        "billing cycles. --synthetic N times the projection on N random loans instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=12)
+        parser.add_argument("--prepayment-rate", type=float, default=0.0, help="Monthly share of the balance prepaid.")
+        parser.add_argument("--stop-rate", type=float, default=0.0, help="Monthly share of the balance going STOPPED.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--synthetic", type=int, default=0, metavar="LOANS")
+
+    def handle(self, *args, **options):
+        months = options["months"]
+        started = time.perf_counter()
+
+        if options["synthetic"]:
+            import numpy as np
+            rng = np.random.default_rng(0)
+            loans = options["synthetic"]
+            for start in range(0, loans, options["chunk_size"]):
+                size = min(options["chunk_size"], loans - start)
+                project(
+                    rng.integers(1000, 500000, size) * 100.0, rng.integers(800, 3600, size), rng.integers(1, 60, size),
+                    months, options["prepayment_rate"], options["stop_rate"],
+                )
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"loans={loans} months={months} projected in {elapsed:.2f}s")
+            return
+
+        loans, rows = forecast_book(months, options["prepayment_rate"], options["stop_rate"], options["chunk_size"])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write("month  " + "  ".join(f"{field:>15}" for field in FORECAST_FIELDS))
+        for row in rows:
+            self.stdout.write(f"{row['month']:>5}  " + "  ".join(f"{row[field]:>15}" for field in FORECAST_FIELDS))
+        self.stdout.write(f"loans={loans} projected in {elapsed:.2f}s")
@@ -0,0 +1,38 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from repayment.settlement import ingest_settlement
+
+
+class Command(BaseCommand):
+    help = (
+        "Applies a settlement CSV (reference, loan_id, amount) of collected repayments in bulk "
+        "and writes a reconciliation report with the outcome of every row."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Settlement CSV file.")
+        parser.add_argument("--report", required=True, help="Where to write the reconciliation report CSV ('-' for stdout).")
+        parser.add_argument("--chunk-size", type=int, default=settings.SETTLEMENT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            settlement_file = open(options["path"], newline="")
+        except OSError as exc:
+            raise CommandError(f"Cannot read {options['path']}: {exc}")
+
+        started = time.perf_counter()
+        with settlement_file:
+            if options["report"] == "-":
+                outcomes = ingest_settlement(settlement_file, sys.stdout, options["chunk_size"])
+            else:
+                with open(options["report"], "w", newline="") as report_file:
+                    outcomes = ingest_settlement(settlement_file, report_file, options["chunk_size"])
+        elapsed = time.perf_counter() - started
+
+        rows = sum(outcomes.values())
+        summary = " ".join(f"{outcome}={count}" for outcome, count in outcomes.items())
+        self.stderr.write(f"rows={rows} {summary} in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
@@ -0,0 +1,252 @@
+import asyncio
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import time
+import uuid
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+
+ENDPOINTS = ("register", "apply", "pay", "statement")
+DEFAULT_MIX = "register=1,apply=1,pay=6,statement=2"
+INSTALLMENTS = 12
+EMI_AMOUNT = 100000
+PAYMENT_AMOUNT = 60000  # Above the minimum due of a seeded loan (3% of principal plus interest)
+
+
+def seed(users, loans):
+    """Creates eligible users and loans whose installments are all DUE. Returns (user ids, loan ids)."""
+    from repayment.ledger import disbursement_event, record_events
+    from repayment.models import Payment
+    from user.models import User, Loan
+
+    seeded_users = User.objects.bulk_create([
+        User(
+            name=f"load {i}", aadhar_number=str(900000000000 + i), email=f"load{i}@example.com",
+            annual_income=500000, credit_score=700,
+        )
+        for i in range(users)
+    ], batch_size=1000)
+    seeded_loans = Loan.objects.bulk_create([
+        Loan(
+            user=seeded_users[i % users], loan_amount=INSTALLMENTS * EMI_AMOUNT, loan_type="Credit Card",
+            interest_rate=12, term_period=INSTALLMENTS, disbursement_date=datetime.date.today(),
+            principal_balance=INSTALLMENTS * EMI_AMOUNT,
+        )
+        for i in range(loans)
+    ], batch_size=1000)
+    # bulk_create skips Loan.save, so the ledgers are opened here
+    record_events([disbursement_event(loan) for loan in seeded_loans], "default")
+    today = datetime.date.today()
+    Payment.objects.bulk_create([
+        Payment(loan=loan, emi_amount=EMI_AMOUNT, due_date=today + datetime.timedelta(days=30 * (n + 1)), status="DUE")
+        for loan in seeded_loans
+        for n in range(INSTALLMENTS)
+    ], batch_size=1000)
+    return [str(user.user_id) for user in seeded_users], [str(loan.loan_id) for loan in seeded_loans]
+
+
+def serve(server, port, database, users, loans, ready):
+    """Child process: migrates and seeds a scratch database, then serves the app on `port`."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "credit_card_service.settings")
+    from django.conf import settings
+
+    settings.DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": database, "OPTIONS": {"timeout": 20}}}
+    settings.ALLOWED_HOSTS = ["127.0.0.1"]
+    # Tasks run in-process (eager), and the rate and velocity limits are lifted
+    # so that the load test measures the endpoints rather than the limiters.
+    settings.CELERY_TASK_ALWAYS_EAGER = True
+    settings.CELERY_BROKER_URL = "memory://"
+    settings.CELERY_RESULT_BACKEND = "cache+memory://"
+    settings.RATE_LIMITS = {scope: {"capacity": 10 ** 9, "per_second": 10 ** 9} for scope in settings.RATE_LIMITS}
+    settings.WRITE_CONCURRENCY_LIMIT = 10 ** 6
+    settings.VELOCITY_LIMITS = {
+        scope: {**limit, "flag": 10 ** 9, "max": 10 ** 9} for scope, limit in settings.VELOCITY_LIMITS.items()
+    }
+
+    import django
+    django.setup()
+    import logging
+    from django.core.management import call_command
+    from django.db import connections
+
+    for logger in ("django.server", "django.request"):
+        logging.getLogger(logger).setLevel(logging.ERROR)
+    call_command("migrate", verbosity=0)
+    ready.put(seed(users, loans))
+    connections.close_all()
+
+    if server == "asgi":
+        import uvicorn
+        uvicorn.run("credit_card_service.asgi:application", host="127.0.0.1", port=port, log_level="error")
+    else:
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+        from django.core.wsgi import get_wsgi_application
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        httpd = ThreadedWSGIServer(("127.0.0.1", port), QuietHandler)
+        httpd.daemon_threads = True
+        httpd.set_app(get_wsgi_application())
+        httpd.serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a scratch database, serves the app on a local WSGI (or ASGI) server and drives "
+        "a mix of register, apply-loan, make-payment and get-statement calls from async clients. "
+        "Reports throughput and p50/p95/p99 latency per endpoint. Celery runs eagerly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi")
+        parser.add_argument("--clients", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=20.0, help="Seconds to drive load for.")
+        parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of load not counted.")
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--loans", type=int, default=1000)
+        parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Endpoint weights (default {DEFAULT_MIX}).")
+        parser.add_argument("--sla-ms", type=float, default=None, help="Flag endpoints whose p99 exceeds this.")
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options["mix"])
+        if options["server"] == "asgi":
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError("--server asgi needs uvicorn installed.")
+
+        port = free_port()
+        context = multiprocessing.get_context("spawn")
+        ready = context.Queue()
+        with tempfile.TemporaryDirectory() as scratch:
+            process = context.Process(
+                target=serve,
+                args=(options["server"], port, os.path.join(scratch, "load.sqlite3"), options["users"], options["loans"], ready),
+                daemon=True,
+            )
+            process.start()
+            try:
+                user_ids, loan_ids = ready.get(timeout=300)
+                results, elapsed = asyncio.run(self.drive(port, mix, user_ids, loan_ids, options))
+            finally:
+                process.terminate()
+                process.join()
+
+        self.report(results, elapsed, options)
+
+    def parse_mix(self, mix):
+        weights = {}
+        for part in mix.split(","):
+            name, _, weight = part.partition("=")
+            if name.strip() not in ENDPOINTS:
+                raise CommandError(f"Unknown endpoint {name!r} in --mix; choose from {', '.join(ENDPOINTS)}.")
+            weights[name.strip()] = float(weight or 1)
+        return weights
+
+    async def drive(self, port, mix, user_ids, loan_ids, options):
+        await self.wait_until_listening(port)
+        names, weights = list(mix), list(mix.values())
+        results = {name: {"latencies": [], "statuses": {}} for name in names}
+        counter = iter(range(10 ** 9))
+        started = time.perf_counter()
+        measure_from = started + options["warmup"]
+        stop_at = measure_from + options["duration"]
+
+        async def client(seed):
+            rng = random.Random(seed)
+            while time.perf_counter() < stop_at:
+                name = rng.choices(names, weights)[0]
+                method, path, body = self.build_request(name, rng, next(counter), user_ids, loan_ids)
+                sent = time.perf_counter()
+                status = await self.request(port, method, path, body)
+                done = time.perf_counter()
+                if sent >= measure_from:
+                    result = results[name]
+                    result["latencies"].append(done - sent)
+                    result["statuses"][status] = result["statuses"].get(status, 0) + 1
+
+        await asyncio.gather(*(client(i) for i in range(options["clients"])))
+        return results, time.perf_counter() - measure_from
+
+    def build_request(self, name, rng, n, user_ids, loan_ids):
+        if name == "register":
+            return "POST", "/api/register-user/", {
+                "name": f"client {n}", "aadhar_id": str(800000000000 + n),
+                "email_id": f"client{n}-{uuid.uuid4().hex[:8]}@example.com", "annual_income": 400000,
+            }
+        if name == "apply":
+            return "POST", "/api/apply-loan/", {
+                "user_id": rng.choice(user_ids), "loan_amount": 3000,
+                "disbursement_date": datetime.date.today().isoformat(),
+            }
+        if name == "pay":
+            return "POST", "/api/make-payment/", {"loan_id": rng.choice(loan_ids), "amount": PAYMENT_AMOUNT}
+        return "GET", "/api/get-statement/?" + urlencode({"loan_id": rng.choice(loan_ids)}), None
+
+    async def wait_until_listening(self, port, timeout=30.0):
+        deadline = time.perf_counter() + timeout
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.close()
+                return
+            except OSError:
+                if time.perf_counter() > deadline:
+                    raise CommandError(f"The server did not start listening on port {port}.")
+                await asyncio.sleep(0.05)
+
+    async def request(self, port, method, path, body):
+        """Sends one HTTP/1.1 request on a fresh connection and reads the whole response. Returns the status."""
+        payload = b"" if body is None else json.dumps(body).encode()
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: close\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+        )
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(head.encode() + payload)
+            await writer.drain()
+            status_line = await reader.readline()
+            while await reader.read(65536):
+                pass
+            writer.close()
+            return int(status_line.split()[1])
+        except (OSError, IndexError, ValueError):
+            return 0  # Connection error
+
+    def report(self, results, elapsed, options):
+        total = sum(len(result["latencies"]) for result in results.values())
+        self.stdout.write(
+            f"server={options['server']} clients={options['clients']} duration={elapsed:.1f}s "
+            f"requests={total} throughput={total / elapsed:.1f} req/s"
+        )
+        self.stdout.write(f"{'endpoint':<10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+        for name, result in results.items():
+            latencies = sorted(result["latencies"])
+            p50, p95, p99 = (percentile(latencies, fraction) * 1000 for fraction in (0.50, 0.95, 0.99))
+            statuses = " ".join(f"{status}:{count}" for status, count in sorted(result["statuses"].items()))
+            over_sla = options["sla_ms"] is not None and p99 > options["sla_ms"]
+            self.stdout.write(
+                f"{name:<10} {len(latencies) / elapsed:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}  {statuses}"
+                + ("  p99 over SLA" if over_sla else "")
+            )
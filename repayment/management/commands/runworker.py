@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from credit_card_service.celery import app, WORKER_PROFILES
+
+
+class Command(BaseCommand):
+    help = "Starts a Celery worker with one of the profiles in WORKER_PROFILES."
+
+    def add_arguments(self, parser):
+        parser.add_argument("profile", choices=sorted(WORKER_PROFILES))
+        parser.add_argument("--loglevel", default="INFO")
+
+    def handle(self, *args, **options):
+        argv = ["worker", f"--loglevel={options['loglevel']}", *WORKER_PROFILES[options["profile"]]]
+        app.worker_main(argv)
@@ -0,0 +1,19 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from repayment.reminders import send_reminders
+
+
+class Command(BaseCommand):
+    help = "Sends reminders for the unpaid installments due in the next few days through REMINDER_SENDER."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=datetime.date.fromisoformat, default=None, help="Run date (default today).")
+        parser.add_argument("--days-ahead", type=int, default=settings.REMINDER_DAYS_AHEAD)
+        parser.add_argument("--batch-size", type=int, default=settings.REMINDER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        sent = send_reminders(options["date"], options["days_ahead"], options["batch_size"])
+        self.stdout.write(f"sent={sent} sender={settings.REMINDER_SENDER}")
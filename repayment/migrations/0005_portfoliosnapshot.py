@@ -0,0 +1,41 @@
+# Generated by Django 5.0 on 2026-10-19 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repayment', '0004_rename_min_due_payment_emi_amount'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='payment',
+            options={'ordering': ['due_date']},
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='PortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_date', models.DateField(db_index=True)),
+                ('computed_at', models.DateTimeField()),
+                ('billing_day', models.IntegerField()),
+                ('loan_type', models.CharField(max_length=100)),
+                ('loan_count', models.IntegerField(default=0)),
+                ('stopped_count', models.IntegerField(default=0)),
+                ('outstanding_principal', models.BigIntegerField(default=0)),
+                ('due_count', models.IntegerField(default=0)),
+                ('partially_completed_count', models.IntegerField(default=0)),
+                ('collections', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('snapshot_date', 'billing_day', 'loan_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-19 01:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repayment', '0005_portfoliosnapshot'),
+        ('user', '0007_user_billing_slot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('path', models.CharField(max_length=255)),
+                ('row_count', models.IntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['loan', '-created'], name='repayment_t_loan_id_5d5eb0_idx'),
+        ),
+    ]
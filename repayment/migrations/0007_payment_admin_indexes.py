@@ -0,0 +1,22 @@
+# Generated by Django 5.0 on 2026-10-19 01:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repayment', '0006_transaction_archive'),
+        ('user', '0008_loan_status_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'due_date'], name='repayment_p_status_6ffa1e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['due_date', 'payment_id'], name='repayment_p_due_dat_304f60_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-19 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repayment', '0007_payment_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionarchivesegment',
+            name='shard',
+            field=models.CharField(default='default', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='transactionarchivesegment',
+            name='month',
+            field=models.DateField(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='transactionarchivesegment',
+            unique_together={('shard', 'month')},
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.0 on 2026-10-19 01:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_ledger(apps, schema_editor):
+    # Replays each loan's disbursement and hot transactions into its ledger.
+    db_alias = schema_editor.connection.alias
+    Loan = apps.get_model('user', 'Loan')
+    Transaction = apps.get_model('repayment', 'Transaction')
+    LoanEvent = apps.get_model('repayment', 'LoanEvent')
+    LoanBalanceSnapshot = apps.get_model('repayment', 'LoanBalanceSnapshot')
+
+    for loan in Loan.objects.using(db_alias).only('loan_id', 'loan_amount', 'created').iterator():
+        events = [LoanEvent(
+            loan_id=loan.loan_id, sequence=1, kind='DISBURSEMENT', amount=loan.loan_amount,
+            principal_delta=loan.loan_amount, occurred_at=loan.created,
+        )]
+        payments = Transaction.objects.using(db_alias).filter(loan_id=loan.loan_id).order_by('created')
+        for sequence, (amount, created) in enumerate(payments.values_list('amount', 'created'), start=2):
+            events.append(LoanEvent(
+                loan_id=loan.loan_id, sequence=sequence, kind='PAYMENT', amount=amount,
+                principal_delta=-amount, occurred_at=created,
+            ))
+
+        snapshots = []
+        principal = paid = 0
+        for event in events:
+            principal += event.principal_delta
+            paid += event.amount if event.kind == 'PAYMENT' else 0
+            if event.sequence % settings.LEDGER_SNAPSHOT_EVERY == 0:
+                snapshots.append(LoanBalanceSnapshot(
+                    loan_id=loan.loan_id, sequence=event.sequence, occurred_at=event.occurred_at,
+                    principal=principal, interest=0, paid=paid,
+                ))
+        LoanEvent.objects.using(db_alias).bulk_create(events, batch_size=1000)
+        LoanBalanceSnapshot.objects.using(db_alias).bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repayment', '0008_archive_segment_shard'),
+        ('user', '0009_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('occurred_at', models.DateTimeField()),
+                ('principal', models.BigIntegerField()),
+                ('interest', models.BigIntegerField()),
+                ('paid', models.BigIntegerField()),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.loan')),
+            ],
+            options={
+                'unique_together': {('loan', 'sequence')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LoanEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('DISBURSEMENT', 'DISBURSEMENT'), ('PAYMENT', 'PAYMENT'), ('INTEREST', 'INTEREST'), ('REAMORTISATION', 'REAMORTISATION')], max_length=20)),
+                ('amount', models.IntegerField(default=0)),
+                ('principal_delta', models.IntegerField(default=0)),
+                ('interest_delta', models.IntegerField(default=0)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('occurred_at', models.DateTimeField()),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.loan')),
+            ],
+            options={
+                'ordering': ['loan', 'sequence'],
+                'unique_together': {('loan', 'sequence')},
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop, hints={'model_name': 'loanevent'}),
+    ]
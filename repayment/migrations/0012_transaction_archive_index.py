@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-19 02:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repayment', '0011_change_feed'),
+        ('user', '0011_loan_change_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionarchivesegment',
+            name='indexed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='TransactionArchiveEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('offset', models.BigIntegerField()),
+                ('length', models.IntegerField()),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.loan')),
+            ],
+            options={
+                'unique_together': {('loan', 'month')},
+            },
+        ),
+    ]
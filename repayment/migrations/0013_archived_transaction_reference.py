@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-19 02:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repayment', '0012_transaction_archive_index'),
+        ('user', '0011_loan_change_seq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTransactionReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(max_length=100, unique=True)),
+                ('transaction_id', models.UUIDField()),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.loan')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repayment', '0013_archived_transaction_reference'),
+        ('user', '0012_outboxmessage_claim'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loanevent',
+            index=models.Index(fields=['occurred_at'], name='repayment_l_occurre_c26d2e_idx'),
+        ),
+    ]
@@ -1,16 +1,23 @@
 from django.db import models
 import uuid
+from repayment.changes import ChangeTracked
 
-class Transaction(models.Model):
+class Transaction(ChangeTracked, models.Model):
     transaction_id = models.UUIDField(primary_key=True, default=uuid.uuid4)
     loan = models.ForeignKey('user.Loan', on_delete=models.CASCADE)
     amount = models.IntegerField()
-    created = models.DateTimeField(auto_now_add=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    reference = models.CharField(max_length=100, null=True, blank=True, unique=True)  # Settlement file row reference
+    change_seq = models.BigIntegerField(default=0)  # See repayment.changes
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['loan', '-created']),
+            models.Index(fields=['change_seq', 'transaction_id']),
+        ]
 
-class Payment(models.Model):
+class Payment(ChangeTracked, models.Model):
 
     PAYMENT_STATUS = (
         ("COMPLETED", "COMPLETED"), 
@@ -25,7 +32,123 @@ class Payment(models.Model):
     total_paid = models.IntegerField(default=0)
     due_date = models.DateField()
     status = models.CharField(choices=PAYMENT_STATUS, max_length=100)
+    change_seq = models.BigIntegerField(default=0)  # See repayment.changes
 
     class Meta:
         ordering = ['due_date']
+        indexes = [
+            models.Index(fields=['status', 'due_date']),
+            models.Index(fields=['due_date', 'payment_id']),
+            models.Index(fields=['change_seq', 'payment_id']),
+        ]
 
+
+class PortfolioSnapshot(models.Model):
+    """
+    Nightly aggregates of the loan book, one row per (billing_day, loan_type).
+    """
+    snapshot_date = models.DateField(db_index=True)
+    computed_at = models.DateTimeField()
+    billing_day = models.IntegerField()
+    loan_type = models.CharField(max_length=100)
+    loan_count = models.IntegerField(default=0)
+    stopped_count = models.IntegerField(default=0)
+    outstanding_principal = models.BigIntegerField(default=0)
+    due_count = models.IntegerField(default=0)
+    partially_completed_count = models.IntegerField(default=0)
+    collections = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('snapshot_date', 'billing_day', 'loan_type')
+
+
+class TransactionArchiveSegment(models.Model):
+    """
+    A month of transactions moved out of the hot Transaction table into a
+    gzip-compressed JSON lines file (see repayment.archive).
+    """
+    month = models.DateField()  # First day of the archived month
+    shard = models.CharField(max_length=100, default='default')  # Database the rows were moved from
+    path = models.CharField(max_length=255)
+    row_count = models.IntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now=True)
+    # Written one gzip member per loan, with TransactionArchiveEntry rows to find them
+    indexed = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['month']
+        unique_together = ('shard', 'month')
+
+
+class TransactionArchiveEntry(models.Model):
+    """
+    Where a loan's rows are in the archive segment of a month: a gzip member of
+    `length` bytes at byte `offset` of the segment file. Stored on the loan's shard.
+    """
+    loan = models.ForeignKey('user.Loan', on_delete=models.CASCADE)
+    month = models.DateField()
+    offset = models.BigIntegerField()
+    length = models.IntegerField()
+
+    class Meta:
+        unique_together = ('loan', 'month')
+
+
+class ArchivedTransactionReference(models.Model):
+    """
+    The settlement reference of a transaction moved to the archive, kept so that
+    the settlement row it came from is still reported as a duplicate.
+    """
+    reference = models.CharField(max_length=100, unique=True)
+    loan = models.ForeignKey('user.Loan', on_delete=models.CASCADE)
+    transaction_id = models.UUIDField()
+
+
+class LoanEvent(models.Model):
+    """
+    An append-only entry in a loan's ledger (see repayment.ledger).
+    A loan's balance at any time is the sum of its events up to then.
+    """
+    EVENT_KINDS = (
+        ("DISBURSEMENT", "DISBURSEMENT"),
+        ("PAYMENT", "PAYMENT"),
+        ("INTEREST", "INTEREST"),
+        ("REAMORTISATION", "REAMORTISATION"),
+    )
+
+    loan = models.ForeignKey('user.Loan', on_delete=models.CASCADE)
+    sequence = models.PositiveIntegerField()  # 1, 2, 3, ... per loan
+    kind = models.CharField(choices=EVENT_KINDS, max_length=20)
+    amount = models.IntegerField(default=0)
+    principal_delta = models.IntegerField(default=0)
+    interest_delta = models.IntegerField(default=0)  # Paise, like Loan.accrued_interest
+    data = models.JSONField(default=dict, blank=True)
+    occurred_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['loan', 'sequence']
+        unique_together = ('loan', 'sequence')
+        indexes = [models.Index(fields=['occurred_at'])]  # Portfolio stats read the events since a snapshot
+
+
+class LoanBalanceSnapshot(models.Model):
+    """
+    A loan's balances after event `sequence`, written every LEDGER_SNAPSHOT_EVERY events.
+    """
+    loan = models.ForeignKey('user.Loan', on_delete=models.CASCADE)
+    sequence = models.PositiveIntegerField()
+    occurred_at = models.DateTimeField()  # Of the event at `sequence`
+    principal = models.BigIntegerField()
+    interest = models.BigIntegerField()
+    paid = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ('loan', 'sequence')
+
+
+class ChangeSequence(models.Model):
+    """
+    The last change sequence number taken on this database (see repayment.changes).
+    A single row, on every shard.
+    """
+    value = models.BigIntegerField(default=0)
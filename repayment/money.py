@@ -0,0 +1,104 @@
+"""
+Fixed-point money maths shared by payments, billing and EMI schedules.
+
+Amounts are integer paise and interest rates integer basis points, so every
+calculation is exact integer arithmetic with a single, explicit rounding
+step (half up) wherever a result is divided. The *_batch variants apply the
+same formulas to numpy int64 arrays for bulk runs; numpy is only imported
+by them, so the web process does not load it.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+PAISE_PER_RUPEE = 100
+BASIS_POINTS = 10000  # 100% in basis points
+DAYS_PER_YEAR = 365
+MIN_DUE_PRINCIPAL_BP = 300  # 3% of the principal is always due
+
+
+def div_round(numerator, denominator):
+    """Integer division rounded half away from zero."""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if 2 * remainder >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def div_round_batch(numerator, denominator):
+    import numpy as np
+    numerator = np.asarray(numerator, dtype=np.int64)
+    quotient = (np.abs(numerator) + denominator // 2) // denominator
+    return np.where(numerator >= 0, quotient, -quotient)
+
+
+def to_paise(rupees):
+    """Converts a rupee amount (int, float or str) to integer paise."""
+    return int((Decimal(str(rupees)) * PAISE_PER_RUPEE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_rupees(paise):
+    """Rounds paise to whole rupees, the unit amounts are stored in."""
+    return div_round(paise, PAISE_PER_RUPEE)
+
+
+def rate_bp(rate_percent):
+    """Converts an annual interest rate in percent (e.g. 12.5) to basis points."""
+    return int((Decimal(str(rate_percent)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def interest(principal_paise, annual_rate_bp, days):
+    """Simple interest in paise on `principal_paise` for `days` days."""
+    return div_round(principal_paise * annual_rate_bp * days, BASIS_POINTS * DAYS_PER_YEAR)
+
+
+def interest_batch(principal_paise, annual_rate_bp, days):
+    import numpy as np
+    principal_paise = np.asarray(principal_paise, dtype=np.int64)
+    return div_round_batch(principal_paise * annual_rate_bp * days, BASIS_POINTS * DAYS_PER_YEAR)
+
+
+def principal_due(principal_paise):
+    """The part of the principal that is always due, in paise."""
+    return div_round(principal_paise * MIN_DUE_PRINCIPAL_BP, BASIS_POINTS)
+
+
+def split_payment(amount, accrued_interest_paise):
+    """
+    Splits a payment of `amount` whole rupees into (interest, principal) rupees.
+    The accrued interest is covered first, in whole rupees; paise below a rupee stay accrued.
+    """
+    interest_part = min(amount, max(0, accrued_interest_paise) // PAISE_PER_RUPEE)
+    return interest_part, amount - interest_part
+
+
+def min_due(principal_paise, annual_rate_bp, days):
+    """Minimum due in paise: 3% of the principal plus the interest for `days` days."""
+    return principal_due(principal_paise) + interest(principal_paise, annual_rate_bp, days)
+
+
+def min_due_batch(principal_paise, annual_rate_bp, days):
+    import numpy as np
+    principal_paise = np.asarray(principal_paise, dtype=np.int64)
+    return (
+        div_round_batch(principal_paise * MIN_DUE_PRINCIPAL_BP, BASIS_POINTS)
+        + interest_batch(principal_paise, annual_rate_bp, days)
+    )
+
+
+def emi_split(principal_paise, installments):
+    """
+    Splits a principal into `installments` equal parts that add up exactly,
+    giving the leftover paise to the earliest installments.
+    """
+    base, leftover = divmod(principal_paise, installments)
+    return [base + 1 if i < leftover else base for i in range(installments)]
+
+
+def emi_split_batch(principal_paise, installments):
+    """
+    Vectorized emi_split over many loans sharing the same number of installments.
+    Returns a (loans, installments) array.
+    """
+    import numpy as np
+    principal_paise = np.asarray(principal_paise, dtype=np.int64)
+    base, leftover = np.divmod(principal_paise, installments)
+    return base[:, None] + (np.arange(installments)[None, :] < leftover[:, None])
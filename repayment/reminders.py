@@ -0,0 +1,122 @@
+"""
+Upcoming-due reminders.
+
+Every night one query per shard streams the installments falling due in the
+next REMINDER_DAYS_AHEAD days, joined to their loan and user, through a
+server-side cursor. Rows are rendered and handed to the REMINDER_SENDER in
+batches of REMINDER_BATCH_SIZE, so memory stays flat however many reminders
+go out. FileSender (the default) writes them to a JSON-lines file per run
+date; EmailSender sends them through one connection of Django's email backend.
+"""
+import datetime
+import itertools
+import json
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from credit_card_service.sharding import shard_aliases
+
+# Installments that still need money when they fall due
+REMINDER_STATUSES = ('DUE', 'PARTIALLY_COMPLETED', 'NOT_DUE')
+FIELDS = ('payment_id', 'due_date', 'emi_amount', 'total_paid', 'loan_id', 'loan__user__name', 'loan__user__email')
+
+SUBJECT = 'Your EMI of Rs. {outstanding} is due on {due_date:%d %b %Y}'
+BODY = (
+    'Dear {name},\n\n'
+    'Rs. {outstanding} of your installment for loan {loan_id} is due on {due_date:%d %b %Y}. '
+    'Please pay before the due date to avoid your loan being stopped.\n'
+)
+
+
+def iter_upcoming_dues(start, end, using=None, chunk_size=None):
+    """
+    Streams the unpaid installments of active loans due between `start` and `end` (inclusive)
+    on one database, straight off the (status, due_date) index without sorting. Installments of
+    stopped or repaid loans are left out.
+    """
+    from repayment.models import Payment
+
+    return Payment.objects.using(using).filter(
+        due_date__gte=start, due_date__lte=end, status__in=REMINDER_STATUSES, loan__loan_status='ACTIVE',
+    ).order_by().values(*FIELDS).iterator(
+        chunk_size=chunk_size or settings.REMINDER_BATCH_SIZE,
+    )
+
+
+def render(row):
+    """Renders one installment row into a reminder: {'payment_id', 'to', 'subject', 'body'}."""
+    context = {
+        'name': row['loan__user__name'],
+        'loan_id': row['loan_id'],
+        'due_date': row['due_date'],
+        'outstanding': row['emi_amount'] - row['total_paid'],
+    }
+    return {
+        'payment_id': str(row['payment_id']),
+        'to': row['loan__user__email'],
+        'subject': SUBJECT.format(**context),
+        'body': BODY.format(**context),
+    }
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+class FileSender:
+    """Appends reminders as JSON lines to REMINDER_OUTBOX_DIR/<run date>.jsonl. A rerun replaces the file."""
+
+    def __init__(self, run_date):
+        path = Path(settings.REMINDER_OUTBOX_DIR) / f'{run_date:%Y-%m-%d}.jsonl'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.file = open(path, 'w')
+
+    def send(self, reminders):
+        self.file.writelines(json.dumps(reminder) + '\n' for reminder in reminders)
+
+    def close(self):
+        self.file.close()
+
+
+class EmailSender:
+    """Sends reminders as emails, a batch at a time, over one connection of the email backend."""
+
+    def __init__(self, run_date):
+        from django.core.mail import get_connection
+        self.connection = get_connection()
+
+    def send(self, reminders):
+        from django.core.mail import EmailMessage
+        self.connection.send_messages([
+            EmailMessage(reminder['subject'], reminder['body'], to=[reminder['to']], connection=self.connection)
+            for reminder in reminders
+        ])
+
+    def close(self):
+        self.connection.close()
+
+
+def send_reminders(today=None, days_ahead=None, batch_size=None):
+    """
+    Sends a reminder for every unpaid installment due from `today` to `days_ahead` days later,
+    shard by shard. Returns the number of reminders sent.
+    """
+    today = today or timezone.localdate()
+    days_ahead = settings.REMINDER_DAYS_AHEAD if days_ahead is None else days_ahead
+    batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+    end = today + datetime.timedelta(days=days_ahead)
+
+    sender = import_string(settings.REMINDER_SENDER)(today)
+    sent = 0
+    try:
+        for shard in shard_aliases():
+            for batch in batched(iter_upcoming_dues(today, end, shard, batch_size), batch_size):
+                sender.send([render(row) for row in batch])
+                sent += len(batch)
+    finally:
+        sender.close()
+    return sent
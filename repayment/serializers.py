@@ -1,3 +1,4 @@
+from django.db import models
 from rest_framework import serializers
 
 from .models import Payment
@@ -5,4 +6,55 @@ from .models import Payment
 class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+def _identity(value):
+    return value
+
+
+def _datetime(value):
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _converter(field):
+    """Picks the conversion DRF's ModelSerializer would apply to this field's value."""
+    if field.is_relation:
+        return _identity  # PrimaryKeyRelatedField returns the raw pk
+    if isinstance(field, models.UUIDField):
+        return str
+    if isinstance(field, models.DateTimeField):
+        return _datetime
+    if isinstance(field, models.DateField):
+        return lambda value: value.isoformat()
+    return _identity  # Integers and choice values are returned as stored
+
+
+class RowEncoder:
+    """
+    Serializer-free encoder producing the same dicts as a ModelSerializer with
+    fields='__all__', built from values_list() tuples with per-column converters
+    computed once instead of DRF's per-row, per-field serialization.
+    """
+
+    def __init__(self, model):
+        fields = [field for field in model._meta.concrete_fields if not field.is_relation]
+        fields += [field for field in model._meta.concrete_fields if field.is_relation]
+        self.columns = tuple(field.name for field in fields)
+        self.attnames = tuple(field.attname for field in fields)
+        self.converters = tuple(_converter(field) for field in fields)
+
+    def encode(self, queryset):
+        """Yields one dict per row of `queryset`."""
+        columns, converters = self.columns, self.converters
+        for row in queryset.values_list(*self.attnames).iterator(chunk_size=2000):
+            yield {
+                column: convert(value) if value is not None else None
+                for column, convert, value in zip(columns, converters, row)
+            }
+
+
+payment_encoder = RowEncoder(Payment)
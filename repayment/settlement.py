@@ -0,0 +1,193 @@
+"""
+Bulk ingestion of repayment settlement files.
+
+A settlement file is a CSV with a header and at least `reference`, `loan_id`
+and `amount` columns (extra columns are ignored), one row per repayment
+collected by a gateway or NACH. The file is streamed in chunks of
+SETTLEMENT_CHUNK_SIZE rows. For each chunk and shard, the loans are locked
+and their open installments loaded with one query each, every row is applied
+in file order with the same rules and waterfall as make-payment, and the
+transactions and ledger events are bulk inserted and the installments and
+loans updated with one prepared statement each, in one DB transaction. A
+row whose reference was already ingested, even if its transaction has since
+been archived, is reported as a duplicate, so a file can be re-run safely.
+
+Every row gets an outcome in the reconciliation report: applied, duplicate
+or rejected, with the reason.
+"""
+import csv
+import itertools
+import uuid
+from decimal import InvalidOperation
+from django.conf import settings
+from django.db import connections, transaction
+from credit_card_service.sharding import shard_for_loan
+from repayment import changes, money
+from repayment.allocation import allocate, open_payments
+from repayment.ledger import record_events
+from user import outbox
+
+REFERENCE_MAX_LENGTH = 100  # Transaction.reference
+REPORT_FIELDS = ('line', 'reference', 'loan_id', 'amount', 'outcome', 'detail', 'transaction_id')
+
+
+class Rejected(Exception):
+    pass
+
+
+def parse_row(line, row):
+    """Returns a report row for a settlement file row, with the loan id and amount parsed when valid."""
+    result = {
+        'line': line, 'reference': (row.get('reference') or '').strip(), 'loan_id': (row.get('loan_id') or '').strip(),
+        'amount': (row.get('amount') or '').strip(), 'outcome': '', 'detail': '', 'transaction_id': '',
+    }
+    try:
+        if not 0 < len(result['reference']) <= REFERENCE_MAX_LENGTH:
+            raise Rejected(f'Missing reference, or longer than {REFERENCE_MAX_LENGTH} characters.')
+        result['loan_id'] = str(uuid.UUID(result['loan_id']))
+        result['amount'] = money.to_rupees(money.to_paise(result['amount']))
+        if result['amount'] <= 0:
+            raise Rejected('Amount must be positive.')
+    except (ValueError, InvalidOperation):
+        result.update(outcome='rejected', detail='Malformed loan_id or amount.')
+    except Rejected as exc:
+        result.update(outcome='rejected', detail=str(exc))
+    return result
+
+
+def check_payment(loan, payments, amount):
+    """The make-payment checks, on loaded rows. Returns the total due before this payment."""
+    if loan.loan_status in ('STOPPED', 'REPAID'):
+        raise Rejected('Loan cannot be processed. Status: ' + loan.loan_status)
+    due = [payment for payment in payments if payment.status in ('DUE', 'PARTIALLY_COMPLETED')]
+    if not due:
+        raise Rejected('No payments are due.')
+    min_due = money.to_rupees(money.principal_due(money.to_paise(loan.principal_balance)) + loan.accrued_interest)
+    if amount < min_due:
+        raise Rejected(f'Minimum due payment is {min_due}.')
+    return sum(payment.emi_amount - payment.total_paid for payment in due)
+
+
+def update_rows(model, objects, fields, using):
+    """
+    Writes `fields` of already loaded `objects` back with one prepared UPDATE run over all of them.
+    Unlike QuerySet.bulk_update, no per-row CASE expression is built.
+    """
+    if not objects:
+        return
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    meta = model._meta
+    columns = [meta.get_field(name) for name in fields]
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(meta.db_table), ', '.join(f'{quote(field.column)} = %s' for field in columns), quote(meta.pk.column),
+    )
+    params = [
+        [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in columns]
+        + [meta.pk.get_db_prep_value(obj.pk, connection)]
+        for obj in objects
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def apply_shard_chunk(rows, using):
+    """Applies the valid rows of one chunk that belong to the loans on `using`, in one DB transaction."""
+    from user.models import Loan
+    from repayment.models import ArchivedTransactionReference, LoanEvent, Payment, Transaction
+
+    loan_ids = {row['loan_id'] for row in rows}
+    with transaction.atomic(using=using):
+        change_seq = changes.next_sequence(using)
+        # Locked in key order, so that concurrent ingestions cannot deadlock
+        loans = {
+            str(loan.loan_id): loan
+            for loan in Loan.objects.using(using).select_for_update().filter(loan_id__in=loan_ids).order_by('loan_id')
+        }
+        payments = {}
+        for payment in open_payments(list(loans), using):
+            payments.setdefault(str(payment.loan_id), []).append(payment)
+        references = [row['reference'] for row in rows]
+        ingested = set(Transaction.objects.using(using).filter(
+            reference__in=references,
+        ).values_list('reference', flat=True))
+        # References of transactions since moved to the archive
+        ingested.update(ArchivedTransactionReference.objects.using(using).filter(
+            reference__in=references,
+        ).values_list('reference', flat=True))
+
+        transactions, events, changed, reamortise = [], [], {}, set()
+        for row in rows:
+            loan = loans.get(row['loan_id'])
+            if row['reference'] in ingested:
+                row.update(outcome='duplicate', detail='Reference already ingested.')
+                continue
+            try:
+                if loan is None:
+                    raise Rejected('Loan not found.')
+                total_due = check_payment(loan, payments.get(row['loan_id'], []), row['amount'])
+            except Rejected as exc:
+                row.update(outcome='rejected', detail=str(exc))
+                continue
+
+            amount = row['amount']
+            ingested.add(row['reference'])
+            record = Transaction(loan=loan, amount=amount, reference=row['reference'], change_seq=change_seq)
+            transactions.append(record)
+            interest_part, principal_part = money.split_payment(amount, loan.accrued_interest)
+            events.append(LoanEvent(
+                loan_id=loan.loan_id, kind='PAYMENT', amount=amount,
+                principal_delta=-principal_part, interest_delta=-money.to_paise(interest_part),
+            ))
+            open_installments = payments.get(row['loan_id'], [])
+            for payment in allocate(open_installments, amount)[0]:
+                payment.change_seq = change_seq
+                changed[payment.payment_id] = payment
+            # Later rows for the loan in this chunk see only what is still open
+            payments[row['loan_id']] = [payment for payment in open_installments if payment.status != 'COMPLETED']
+            if loan.principal_balance == principal_part:
+                loan.principal_balance = 0
+                loan.loan_status = 'REPAID'
+            else:
+                loan.principal_balance -= principal_part
+            loan.change_seq = change_seq
+            loan.accrued_interest -= money.to_paise(interest_part)
+            if amount > total_due:
+                reamortise.add(row['loan_id'])
+            row.update(outcome='applied', transaction_id=str(record.transaction_id))
+
+        Transaction.objects.using(using).bulk_create(transactions, batch_size=1000)
+        record_events(events, using)
+        update_rows(Payment, list(changed.values()), ['total_paid', 'status', 'change_seq'], using)
+        update_rows(
+            Loan, [loans[loan_id] for loan_id in {row['loan_id'] for row in rows if row['outcome'] == 'applied'}],
+            ['principal_balance', 'loan_status', 'accrued_interest', 'change_seq'], using,
+        )
+        for loan_id in reamortise:
+            outbox.enqueue('repayment.tasks.update_next_emis', loan_id, key=loan_id, using=using)
+
+
+def ingest_settlement(settlement_file, report_file, chunk_size=None):
+    """
+    Ingests a settlement CSV from the open `settlement_file` and writes the reconciliation
+    report CSV to `report_file`. Returns the number of rows per outcome.
+    """
+    chunk_size = chunk_size or settings.SETTLEMENT_CHUNK_SIZE
+    report = csv.DictWriter(report_file, REPORT_FIELDS)
+    report.writeheader()
+    outcomes = {'applied': 0, 'duplicate': 0, 'rejected': 0}
+
+    # Line numbers count the header as line 1
+    lines = enumerate(csv.DictReader(settlement_file), start=2)
+    while chunk := [parse_row(line, row) for line, row in itertools.islice(lines, chunk_size)]:
+        by_shard = {}
+        for row in chunk:
+            if not row['outcome']:
+                by_shard.setdefault(shard_for_loan(row['loan_id']), []).append(row)
+        for using, rows in by_shard.items():
+            apply_shard_chunk(rows, using)
+
+        report.writerows(chunk)
+        for row in chunk:
+            outcomes[row['outcome']] += 1
+    return outcomes
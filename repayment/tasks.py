@@ -1,57 +1,103 @@
-import pandas as pd
 from celery import shared_task
 from credit_card_service.celery import app
 import datetime
+from django.db import transaction
 from django.db.models import Q
+from repayment import changes, money
+from credit_card_service.sharding import shard_aliases, shard_for_loan
+from repayment.ledger import record_event
 
-def get_users_billing_day(day):
-    from user.models import User
-    return User.objects.filter(billing_day=int(day))
+def get_loans_billing_slice(day, slot, using=None):
+    from user.models import Loan
+    return Loan.objects.using(using).filter(user__billing_day=int(day), user__billing_slot=int(slot)).select_related('user')
 
 def billing_process(loan, name, date):
     # Check if last payment done or not?
     # update status of next payment to DUE from NOT_DUE
     # create billing details and due payments csv file 
     print('started billing process for', loan, name, date)
+    import pandas as pd
     from repayment.models import Payment
-    from repayment.serializers import PaymentSerializer
+    from repayment.serializers import payment_encoder
 
-    if len(Payment.objects.filter(loan=loan.loan_id, status='DUE')) != 0:
+    payments = Payment.objects.using(loan._state.db)  # The loan's shard
+    if len(payments.filter(loan=loan.loan_id, status='DUE')) != 0:
         loan.loan_status = "STOPPED"
         loan.save()
     
-    next_payment = Payment.objects.filter(loan=loan.loan_id, status='NOT_DUE')[0]
+    next_payment = payments.filter(loan=loan.loan_id, status='NOT_DUE')[0]
     next_payment.status = 'DUE'
     next_payment.save()
 
-    billed_payments = Payment.objects.filter(Q(loan=loan.loan_id) & (Q(status="COMPLETED") | Q(status="PARTIALLY_COMPLETED")))
-    serialized_billed_payments = PaymentSerializer(billed_payments, many=True).data
+    billed_payments = payments.filter(Q(loan=loan.loan_id) & (Q(status="COMPLETED") | Q(status="PARTIALLY_COMPLETED")))
+    serialized_billed_payments = list(payment_encoder.encode(billed_payments))
     print(serialized_billed_payments)
     billed_payments_df = pd.DataFrame(serialized_billed_payments)
     billed_payments_df.to_csv('./data/billed_payments_' + name + '_' + date + '.csv')
     
 
-    due_payments = Payment.objects.filter(Q(loan=loan.loan_id) & (Q(status="DUE") | Q(status="NOT_DUE")))
-    serialized_due_payments = PaymentSerializer(due_payments, many=True).data
+    due_payments = payments.filter(Q(loan=loan.loan_id) & (Q(status="DUE") | Q(status="NOT_DUE")))
+    serialized_due_payments = list(payment_encoder.encode(due_payments))
     print(serialized_due_payments)
     due_payments_df = pd.DataFrame(serialized_due_payments)
+    # Interest accrued nightly since the last payment, due with this bill
+    due_payments_df['accrued_interest'] = money.to_rupees(loan.accrued_interest)
     due_payments_df.to_csv('./data/due_payments_' + name + '_' + date + '.csv')
     
 @app.task
-def billing_queue():
+def billing_queue(slot=None):
     print('Billing Queue Started')
-    from user.models import User, Loan
     now = datetime.datetime.now()
     month_day = now.day
-    users = get_users_billing_day(month_day)
-    print("Users For Today:", users)
+    if slot is None:
+        slot = now.hour
+    print("Loans for today's slot:", month_day, slot)
+
+    for shard in shard_aliases():
+        for loan in get_loans_billing_slice(month_day, slot, using=shard):
+            billing_process(loan, loan.user.name, str(now.day) + '-' +  str(now.month) + '-' + str(now.year))
+
+@app.task
+def rebill_loans(loan_ids):
+    # Re-runs the billing process for the given loans, e.g. from the admin.
+    from user.models import Loan
+    now = datetime.datetime.now()
+    by_shard = {}
+    for loan_id in loan_ids:
+        by_shard.setdefault(shard_for_loan(loan_id), []).append(loan_id)
+    for shard, shard_loan_ids in by_shard.items():
+        for loan in Loan.objects.using(shard).filter(loan_id__in=shard_loan_ids).select_related('user'):
+            billing_process(loan, loan.user.name, str(now.day) + '-' +  str(now.month) + '-' + str(now.year))
+
+@app.task
+def recompute_emis(loan_ids):
+    # Recomputes the next EMIs of a list of loans in one task, e.g. from the admin.
+    from user.models import Loan
+    for loan_id in loan_ids:
+        try:
+            update_next_emis(loan_id)
+        except Loan.DoesNotExist:
+            continue
+
+@app.task
+def snapshot_portfolio():
+    from repayment.analytics import take_portfolio_snapshot
+    print('Portfolio snapshot rows written:', take_portfolio_snapshot())
+
+@app.task
+def archive_transactions():
+    from repayment.archive import archive_transactions as archive
+    print('Transactions archived:', archive())
+
+@app.task
+def accrue_interest():
+    from repayment.accrual import accrue_interest as accrue
+    print('Loans accrued:', accrue())
 
-    for user in users:
-        name = user.name
-        loans = Loan.objects.filter(user=user.user_id)
-        print("loans for:", user.name, loans)
-        for loan in loans:
-            billing_process(loan, name, str(now.day) + '-' +  str(now.month) + '-' + str(now.year))
+@app.task
+def send_due_reminders():
+    from repayment.reminders import send_reminders
+    print('Due reminders sent:', send_reminders())
 
 @shared_task
 def update_next_emis(loan_id):
@@ -61,14 +107,16 @@ def update_next_emis(loan_id):
     from user.models import Loan
     from repayment.models import Payment
 
-    loan = Loan.objects.get(loan_id=loan_id)
+    loan = Loan.objects.using(shard_for_loan(loan_id)).get(loan_id=loan_id)
     print('Current Principal Balance When Extra Payment was done:', loan.principal_balance)
     interest_rate = loan.interest_rate
 
     current_principal_balance = loan.principal_balance
 
-    # Fetch ALL not due payments
-    payments = Payment.objects.filter(loan=loan_id, status="NOT_DUE")
+    # Fetch ALL not due payments that were not already prepaid by the payment waterfall
+    payments = list(Payment.objects.using(loan._state.db).filter(loan=loan_id, status="NOT_DUE", total_paid=0))
+    if not payments:
+        return
     today = datetime.datetime.now()
     print(loan.user.billing_day, today.month, today.year)
     if today.day > loan.user.billing_day:
@@ -78,19 +126,26 @@ def update_next_emis(loan_id):
         new_year = today.year if today.month != 1 else today.year - 1
         last_billing_date = datetime.datetime(day=loan.user.billing_day, month=new_month, year=new_year)
     
-    constant_part_emi = round(current_principal_balance / len(payments))
-    print("constant_part_emi: ",constant_part_emi)
+    # Schedule maths is done in integer paise and rounded to rupees only when stored
+    annual_rate_bp = money.rate_bp(interest_rate)
+    balance = money.to_paise(current_principal_balance)
+    principal_parts = money.emi_split(balance, len(payments))
+    print("constant_part_emi: ", money.to_rupees(principal_parts[0]))
 
-    for payment in payments:
+    for payment, principal_part in zip(payments, principal_parts):
         due_date = datetime.datetime.combine(payment.due_date, datetime.datetime.min.time())
         duration = (due_date - datetime.timedelta(days=15)) - last_billing_date
         days_of_interest = duration.days
-        interest_accured = round(round(interest_rate / 365, 3) * days_of_interest * current_principal_balance / 100) 
-        payment.emi_amount = constant_part_emi + interest_accured
-        current_principal_balance -= payment.emi_amount
-        payment.save()
-
-
-
-    
+        interest_accured = money.interest(balance, annual_rate_bp, days_of_interest)
+        emi = principal_part + interest_accured
+        payment.emi_amount = money.to_rupees(emi)
+        balance -= emi
 
+    with transaction.atomic(using=loan._state.db):
+        change_seq = changes.next_sequence(loan._state.db)
+        for payment in payments:
+            payment.change_seq = change_seq
+        Payment.objects.using(loan._state.db).bulk_update(payments, ['emi_amount', 'change_seq'])
+        record_event(loan, 'REAMORTISATION', data={
+            'emis': [[payment.due_date.isoformat(), payment.emi_amount] for payment in payments],
+        })
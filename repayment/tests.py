@@ -0,0 +1,360 @@
+import datetime
+import gzip
+import io
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from credit_card_service import throttling
+from credit_card_service.throttling import ClientRateThrottle
+from repayment import accrual, analytics, archive, changes, forecast, ledger, money, reminders, velocity
+from repayment.allocation import apply_payment
+from repayment.models import Payment, Transaction, TransactionArchiveEntry, TransactionArchiveSegment
+from repayment.serializers import PaymentSerializer, payment_encoder
+from repayment.settlement import ingest_settlement
+from user.models import Loan, User
+
+
+def create_loan(name='a', aadhar_number='123412341234'):
+    """A 5000 loan of a new user with one installment due and two to come."""
+    user = User.objects.bulk_create([
+        User(name=name, aadhar_number=aadhar_number, email=f'{name}@example.com', annual_income=200000, credit_score=700),
+    ])[0]
+    loan = Loan(
+        user=user, loan_amount=5000, loan_type='Credit Card', interest_rate=12, term_period=12,
+        disbursement_date=datetime.date(2026, 1, 1), principal_balance=5000,
+    )
+    loan.save()
+    Payment.objects.bulk_create([
+        Payment(loan=loan, emi_amount=450, due_date=datetime.date(2026, month, 1), status=status)
+        for month, status in ((2, 'DUE'), (3, 'NOT_DUE'), (4, 'NOT_DUE'))
+    ])
+    return loan
+
+
+class PaymentEncoderTests(TestCase):
+    def test_rows_match_the_model_serializer(self):
+        loan = create_loan()
+        Payment.objects.filter(due_date=datetime.date(2026, 2, 1)).update(total_paid=450, status='COMPLETED')
+        payments = Payment.objects.order_by('due_date')
+        self.assertEqual(list(payment_encoder.encode(payments)), [dict(row) for row in PaymentSerializer(payments, many=True).data])
+        self.assertEqual(len(list(payment_encoder.encode(payments.filter(loan=loan)))), 3)
+
+
+class MoneyTests(SimpleTestCase):
+    def test_division_rounds_half_away_from_zero(self):
+        self.assertEqual([money.div_round(n, 4) for n in (5, 6, 7, -5, -6, -7)], [1, 2, 2, -1, -2, -2])
+        self.assertEqual(list(money.div_round_batch([5, 6, 7, -5, -6, -7], 4)), [1, 2, 2, -1, -2, -2])
+
+    def test_conversions_are_exact(self):
+        self.assertEqual(money.to_paise(0.1 + 0.2), 30)
+        self.assertEqual(money.to_paise('12.345'), 1235)
+        self.assertEqual(money.to_rupees(4950), 50)
+        self.assertEqual(money.rate_bp(12.5), 1250)
+
+    def test_batch_variants_match_the_scalar_ones(self):
+        principals = [0, 1, 99, 500000, 123456789]
+        for days in (1, 30, 31):
+            self.assertEqual(list(money.interest_batch(principals, 1250, days)), [money.interest(p, 1250, days) for p in principals])
+            self.assertEqual(list(money.min_due_batch(principals, 1250, days)), [money.min_due(p, 1250, days) for p in principals])
+
+    def test_emi_split_adds_up_to_the_principal(self):
+        self.assertEqual(money.emi_split(1000, 3), [334, 333, 333])
+        split = money.emi_split_batch([1000, 1001, 99], 3)
+        self.assertEqual(split.tolist(), [money.emi_split(p, 3) for p in (1000, 1001, 99)])
+        self.assertEqual(split.sum(axis=1).tolist(), [1000, 1001, 99])
+
+
+class ForecastTests(TestCase):
+    def test_installments_repay_the_balance_with_interest(self):
+        projected = forecast.project([300000], [1200], [3], months=4, cycle_days=365)
+        self.assertEqual(projected['principal'][0].tolist(), [100000, 100000, 100000, 0])
+        self.assertEqual(projected['interest'][0].tolist(), [36000, 24000, 12000, 0])
+        self.assertEqual(projected['closing_balance'][0].tolist(), [200000, 100000, 0, 0])
+
+    def test_scenarios_account_for_the_whole_balance(self):
+        principal = [500000.0, 120000.0]
+        projected = forecast.project(principal, [1200, 2400], [12, 3], months=6, prepayment_rate=0.05, stop_rate=0.02)
+        opening = [principal] + projected['closing_balance'].T[:-1].tolist()
+        for month in range(6):
+            out = sum(projected[field][:, month] for field in ('principal', 'prepayments', 'stopped', 'closing_balance'))
+            self.assertEqual(out.round(6).tolist(), [round(value, 6) for value in opening[month]])
+
+    def test_book_totals_do_not_depend_on_the_chunk_size(self):
+        create_loan('a', '123412341230')
+        create_loan('b', '123412341231')
+        loans, rows = forecast.forecast_book(months=3)
+        self.assertEqual(loans, 2)
+        self.assertEqual(forecast.forecast_book(months=3, chunk_size=1), (loans, rows))
+        # Three open installments each, so the book is repaid in three cycles; each row is rounded to rupees
+        self.assertAlmostEqual(sum(row['principal'] for row in rows), 10000, delta=len(rows))
+        self.assertEqual(rows[-1]['closing_balance'], 0)
+
+
+class PaymentInterestTests(TestCase):
+    """A payment settles the interest accrued on the loan before it reduces the principal."""
+
+    def setUp(self):
+        self.loan = create_loan()
+        Loan.objects.filter(pk=self.loan.pk).update(accrued_interest=4932)
+
+    def assert_settled(self, principal, accrued, principal_delta, interest_delta):
+        loan = Loan.objects.get(pk=self.loan.pk)
+        self.assertEqual((loan.principal_balance, loan.accrued_interest), (principal, accrued))
+        event = self.loan.loanevent_set.filter(kind='PAYMENT').get()
+        self.assertEqual((event.principal_delta, event.interest_delta), (principal_delta, interest_delta))
+
+    def test_split_payment(self):
+        self.assertEqual(money.split_payment(300, 4932), (49, 251))
+        self.assertEqual(money.split_payment(30, 4932), (30, 0))
+        self.assertEqual(money.split_payment(300, 0), (0, 300))
+
+    def test_apply_payment_settles_accrued_interest_first(self):
+        apply_payment(self.loan.loan_id, 300)
+        # 49 rupees of interest are paid; the 32 paise below a rupee stay accrued
+        self.assert_settled(principal=4749, accrued=32, principal_delta=-251, interest_delta=-4900)
+        self.assertEqual(ledger.balance_at(self.loan.loan_id)['principal'], 4749)
+
+    def test_settlement_settles_accrued_interest_first(self):
+        report = io.StringIO()
+        outcomes = ingest_settlement(io.StringIO(f'reference,loan_id,amount\nS1,{self.loan.loan_id},300\n'), report)
+        self.assertEqual(outcomes['applied'], 1, report.getvalue())
+        self.assert_settled(principal=4749, accrued=32, principal_delta=-251, interest_delta=-4900)
+
+    def test_repaid_when_principal_part_covers_the_balance(self):
+        Loan.objects.filter(pk=self.loan.pk).update(principal_balance=250)
+        apply_payment(self.loan.loan_id, 299)
+        loan = Loan.objects.get(pk=self.loan.pk)
+        self.assertEqual((loan.principal_balance, loan.loan_status), (0, 'REPAID'))
+
+
+class LedgerInterestTests(TestCase):
+    """The ledger's interest follows the interest accrued on the loan and settled by payments."""
+
+    def test_ledger_interest_matches_accrued_interest(self):
+        loan = create_loan()
+        self.assertEqual(accrual.accrue_interest(day=datetime.date(2026, 1, 31)), 1)
+        accrued = Loan.objects.get(pk=loan.pk).accrued_interest
+        self.assertGreater(accrued, 0)
+        self.assertEqual(ledger.balance_at(loan.loan_id)['interest'], accrued)
+
+        apply_payment(loan.loan_id, 500)
+        loan = Loan.objects.get(pk=loan.pk)
+        # Only whole rupees of interest are paid, so some paise stay accrued
+        self.assertGreater(loan.accrued_interest, 0)
+        self.assertEqual(ledger.balance_at(loan.loan_id)['interest'], loan.accrued_interest)
+
+    def test_accrual_rerun_records_no_second_event(self):
+        loan = create_loan()
+        accrual.accrue_interest(day=datetime.date(2026, 1, 31))
+        accrual.accrue_interest(day=datetime.date(2026, 1, 31))
+        self.assertEqual(loan.loanevent_set.filter(kind='INTEREST').count(), 1)
+
+
+@override_settings(LEDGER_SNAPSHOT_EVERY=2)
+class LedgerReplayTests(TestCase):
+    """Balances are rebuilt from the events, across balance snapshots."""
+
+    def at(self, *day):
+        return timezone.make_aware(datetime.datetime(*day))
+
+    def test_statement_around_disbursement_accrual_and_payment(self):
+        with mock.patch.object(ledger.timezone, 'now', return_value=self.at(2026, 1, 1)):
+            loan = create_loan()
+        with mock.patch.object(ledger.timezone, 'now', return_value=self.at(2026, 2, 1, 0, 10)):
+            accrual.accrue_interest(day=datetime.date(2026, 1, 31))
+        with mock.patch.object(ledger.timezone, 'now', return_value=self.at(2026, 2, 5)):
+            apply_payment(loan.loan_id, 500)
+        loan = Loan.objects.get(pk=loan.pk)
+        self.assertEqual(loan.loanevent_set.filter(kind='DISBURSEMENT').get().principal_delta, 5000)
+
+        window = ledger.statement(loan.loan_id, since=self.at(2026, 1, 15), until=self.at(2026, 3, 1))
+        opening, closing = window['opening'], window['closing']
+        self.assertEqual((opening['sequence'], opening['principal'], opening['interest']), (1, 5000, 0))
+        self.assertEqual([line['kind'] for line in window['lines']], ['INTEREST', 'PAYMENT'])
+        self.assertEqual((closing['principal'], closing['interest']), (loan.principal_balance, loan.accrued_interest))
+        self.assertEqual(closing['paid'], 500)
+        self.assertEqual(ledger.balance_at(loan.loan_id), closing)
+        self.assertEqual(ledger.balance_at(loan.loan_id, self.at(2026, 2, 2))['interest'], 4932)
+
+
+class PortfolioStatsTests(TestCase):
+    def test_intraday_view_adds_principal_repaid_and_the_days_collections(self):
+        loan = create_loan()
+        Loan.objects.filter(pk=loan.pk).update(
+            accrued_interest=4932, created=timezone.make_aware(datetime.datetime(2026, 1, 1)),
+        )
+        # A payment made today before the nightly snapshot ran at 00:30
+        early = Transaction.objects.create(loan=loan, amount=100)
+        Transaction.objects.filter(pk=early.pk).update(created=timezone.make_aware(datetime.datetime(2026, 1, 10, 0, 10)))
+        with mock.patch.object(analytics.timezone, 'now', return_value=timezone.make_aware(datetime.datetime(2026, 1, 10, 0, 30))):
+            analytics.take_portfolio_snapshot()
+
+        apply_payment(loan.loan_id, 500)
+        [group] = analytics.get_portfolio_stats()['groups']
+        # 49 of the 500 settled accrued interest
+        self.assertEqual(group['outstanding_principal'], 5000 - 451)
+        self.assertEqual(group['collections_since_snapshot'], 600)
+
+
+class IdempotentPaymentTests(TestCase):
+    """Retries with the same Idempotency-Key get the stored response, except for 429s."""
+
+    def setUp(self):
+        self.loan = create_loan()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def pay(self, amount=500, client='10.0.0.1'):
+        return self.client.post(
+            '/api/make-payment/', {'loan_id': str(self.loan.loan_id), 'amount': amount},
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY='retry-1', REMOTE_ADDR=client,
+        )
+
+    def test_velocity_refusal_is_not_replayed(self):
+        with mock.patch.object(velocity, 'check_velocity', side_effect=velocity.VelocityExceeded('loan', settings.VELOCITY_LIMITS['loan'], 30)):
+            refused = self.pay()
+        self.assertEqual((refused.status_code, refused['Retry-After']), (429, '30'))
+
+        accepted = self.pay()
+        self.assertEqual(accepted.status_code, 200)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+        replayed = self.pay()
+        self.assertEqual((replayed.status_code, replayed['Idempotent-Replayed']), (200, 'true'))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_key_is_scoped_by_client(self):
+        self.assertEqual(self.pay(amount=200, client='10.0.0.1').status_code, 200)
+        other = self.pay(amount=200, client='10.0.0.2')
+        self.assertEqual(other.status_code, 200)
+        self.assertFalse(other.has_header('Idempotent-Replayed'))
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_replay_is_served_ahead_of_the_limits(self):
+        self.assertEqual(self.pay().status_code, 200)
+        gate = throttling._get_gate()
+        held = 0
+        while gate.acquire(blocking=False):
+            held += 1
+        self.addCleanup(lambda: [gate.release() for _ in range(held)])
+        with mock.patch.multiple(ClientRateThrottle, allow_request=mock.Mock(return_value=False), wait=mock.Mock(return_value=1)):
+            replayed = self.pay()
+        self.assertEqual((replayed.status_code, replayed['Idempotent-Replayed']), (200, 'true'))
+
+    def test_reused_key_with_another_body_is_rejected(self):
+        self.assertEqual(self.pay(amount=500).status_code, 200)
+        self.assertEqual(self.pay(amount=600).status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+class ClientIdentTests(TestCase):
+    def test_client_cannot_pick_its_own_address(self):
+        request = RequestFactory().post(
+            '/api/make-payment/', HTTP_X_FORWARDED_FOR='203.0.113.9, 198.51.100.7', REMOTE_ADDR='10.0.0.1',
+        )
+        # Only the entry added by the proxy in front of the app counts
+        self.assertEqual(ClientRateThrottle().get_ident(request), '198.51.100.7')
+
+
+class ChangeFeedTests(TestCase):
+    def test_malformed_cursor_position_is_a_bad_request(self):
+        cursor = changes.encode_cursor({'default': {'payments': [3, 'not-a-uuid']}})
+        response = self.client.get('/api/changes/', {'since': cursor}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_pages_resume_after_the_cursor(self):
+        loan = create_loan()
+        first = self.client.get('/api/changes/', {'limit': 2}, HTTP_ACCEPT='application/json').json()
+        rest = self.client.get('/api/changes/', {'since': first['cursor']}, HTTP_ACCEPT='application/json').json()
+        self.assertTrue(first['has_more'])
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(len(first['loans'] + first['payments'] + rest['loans'] + rest['payments']), 4)
+
+        apply_payment(loan.loan_id, 500)
+        synced = self.client.get('/api/changes/', {'since': rest['cursor']}, HTTP_ACCEPT='application/json').json()
+        self.assertEqual((len(synced['loans']), len(synced['payments']), len(synced['transactions'])), (1, 2, 1))
+
+
+class TransactionArchiveTests(TestCase):
+    """Archived months are read per loan, through the segment index."""
+
+    def setUp(self):
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+        settings_override = override_settings(TRANSACTION_ARCHIVE_DIR=self.archive_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        users = User.objects.bulk_create([
+            User(name=str(n), aadhar_number=str(n), email=f'{n}@example.com', annual_income=1, credit_score=700)
+            for n in range(3)
+        ])
+        self.loans = Loan.objects.bulk_create([
+            Loan(
+                user=user, loan_amount=1000, loan_type='Credit Card', interest_rate=12, term_period=12,
+                disbursement_date=datetime.date(2025, 1, 1), principal_balance=1000,
+            )
+            for user in users
+        ])
+        created = timezone.make_aware(datetime.datetime(2025, 2, 10))
+        transactions = Transaction.objects.bulk_create([
+            Transaction(loan=loan, amount=amount) for loan in self.loans for amount in (100, 200)
+        ])
+        Transaction.objects.filter(pk__in=[row.pk for row in transactions]).update(created=created)
+        self.month = datetime.date(2025, 2, 1)
+
+    def test_statement_reads_only_the_loans_member(self):
+        self.assertEqual(archive.archive_month(self.month), 6)
+        self.assertTrue(TransactionArchiveSegment.objects.get().indexed)
+        self.assertEqual(TransactionArchiveEntry.objects.count(), 3)
+
+        with mock.patch.object(archive, 'read_segment', side_effect=AssertionError('full segment scan')):
+            rows = archive.get_loan_transactions(self.loans[1].loan_id)
+        self.assertEqual(sorted(row['amount'] for row in rows), [100, 200])
+        self.assertEqual({row['loan_id'] for row in rows}, {self.loans[1].loan_id})
+
+    def test_unindexed_segment_is_scanned_then_rewritten(self):
+        archive.archive_month(self.month)
+        segment = TransactionArchiveSegment.objects.get()
+        # A segment written before the index: rows in one gzip member, in time order
+        rows = sorted(archive.read_segment(segment.path), key=lambda row: row['created'])
+        with gzip.open(segment.path, 'wt') as legacy:
+            legacy.writelines(archive.encode_row(row) + '\n' for row in rows)
+        TransactionArchiveEntry.objects.all().delete()
+        TransactionArchiveSegment.objects.update(indexed=False)
+
+        self.assertEqual(len(archive.get_loan_transactions(self.loans[0].loan_id)), 2)
+        archive.archive_transactions()
+        self.assertTrue(TransactionArchiveSegment.objects.get().indexed)
+        self.assertEqual(TransactionArchiveEntry.objects.count(), 3)
+        self.assertEqual(len(archive.get_loan_transactions(self.loans[0].loan_id)), 2)
+
+    def test_archived_settlement_reference_is_still_a_duplicate(self):
+        loan = self.loans[0]
+        Payment.objects.create(loan=loan, emi_amount=450, due_date=datetime.date(2025, 3, 1), status='DUE')
+        settlement = f'reference,loan_id,amount\nGW-1,{loan.loan_id},500\n'
+        self.assertEqual(ingest_settlement(io.StringIO(settlement), io.StringIO())['applied'], 1)
+        Transaction.objects.filter(reference='GW-1').update(created=timezone.make_aware(datetime.datetime(2025, 2, 20)))
+
+        archive.archive_month(self.month)
+        self.assertFalse(Transaction.objects.filter(reference='GW-1').exists())
+        archived = [row for row in archive.get_loan_transactions(loan.loan_id) if row['reference'] == 'GW-1']
+        self.assertEqual(len(archived), 1)
+        self.assertGreater(archived[0]['change_seq'], 0)
+
+        outcomes = ingest_settlement(io.StringIO(settlement), io.StringIO())
+        self.assertEqual((outcomes['applied'], outcomes['duplicate']), (0, 1))
+
+
+class DueReminderTests(TestCase):
+    def test_only_active_loans_are_reminded(self):
+        active, repaid = create_loan('a', '123412341234'), create_loan('b', '123412341235')
+        Loan.objects.filter(pk=repaid.pk).update(loan_status='REPAID')
+        with tempfile.TemporaryDirectory() as outbox_dir, override_settings(REMINDER_OUTBOX_DIR=outbox_dir):
+            # The installment due on 1 Feb 2026 of each loan is in the window
+            self.assertEqual(reminders.send_reminders(today=datetime.date(2026, 1, 25), days_ahead=7), 1)
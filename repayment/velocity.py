@@ -0,0 +1,136 @@
+"""
+Sliding-window payment velocity counters for fraud checks.
+
+Each loan and each client address gets a ring of VELOCITY_LIMITS[scope]
+['buckets'] counters covering 'window' seconds, kept in the VELOCITY_CACHE
+with their running total, so "payments in the last window" is one cache
+read and recording a payment one read and one write, without touching the
+Transaction table. Counts are exact to within one bucket. A payment that
+makes 'flag' or more in the window is logged; one beyond 'max' is refused
+with 429.
+
+Loan counters are rebuilt from the last window of transactions the first
+time a process checks velocity. Client addresses are not stored on
+transactions, so client counters start empty.
+"""
+import datetime
+import logging
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from credit_card_service.sharding import shard_aliases
+
+logger = logging.getLogger(__name__)
+
+_warmed = False
+_warm_lock = threading.Lock()
+
+
+class VelocityExceeded(Exception):
+    def __init__(self, scope, limit, retry_after):
+        super().__init__(f"Too many payments for this {scope}: at most {limit['max']} in {limit['window'] // 60} minutes.")
+        self.retry_after = retry_after
+
+
+class SlidingWindowCounter:
+    """Counts events per key over the last `window` seconds in `buckets` ring-buffered slots."""
+
+    def __init__(self, scope):
+        limit = settings.VELOCITY_LIMITS[scope]
+        self.scope = scope
+        self.buckets = limit['buckets']
+        self.bucket_seconds = limit['window'] / self.buckets
+        self.cache = caches[settings.VELOCITY_CACHE]
+
+    def key(self, ident):
+        return f'velocity:{self.scope}:{ident}'
+
+    def bucket_of(self, timestamp):
+        return int(timestamp // self.bucket_seconds)
+
+    def advance(self, state, bucket):
+        """Returns the ring `state` (head bucket, total, counts) moved forward to `bucket`."""
+        if state is None or bucket - state[0] >= self.buckets:
+            return bucket, 0, [0] * self.buckets
+        head, total, counts = state
+        # Clears the slots that fell out of the window since the head was last moved.
+        for stale in range(head + 1, bucket + 1):
+            total -= counts[stale % self.buckets]
+            counts[stale % self.buckets] = 0
+        return max(head, bucket), total, counts
+
+    def count(self, ident, now=None):
+        bucket = self.bucket_of(time.time() if now is None else now)
+        return self.advance(self.cache.get(self.key(ident)), bucket)[1]
+
+    def add(self, ident, now=None):
+        """Records one event for `ident` and returns the count in the window including it."""
+        bucket = self.bucket_of(time.time() if now is None else now)
+        head, total, counts = self.advance(self.cache.get(self.key(ident)), bucket)
+        counts[head % self.buckets] += 1
+        self.cache.set(self.key(ident), (head, total + 1, counts), self.timeout())
+        return total + 1
+
+    def timeout(self):
+        # An untouched ring expires once every slot in it is out of the window.
+        return math.ceil(self.buckets * self.bucket_seconds)
+
+    def load(self, timestamps_by_ident, now=None):
+        """Replaces the rings of the given keys with counts built from their event timestamps."""
+        bucket = self.bucket_of(time.time() if now is None else now)
+        rings = {}
+        for ident, timestamps in timestamps_by_ident.items():
+            counts = [0] * self.buckets
+            for timestamp in timestamps:
+                event_bucket = self.bucket_of(timestamp)
+                if bucket - self.buckets < event_bucket <= bucket:
+                    counts[event_bucket % self.buckets] += 1
+            rings[self.key(ident)] = (bucket, sum(counts), counts)
+        self.cache.set_many(rings, self.timeout())
+
+
+def warm_loan_counters():
+    """Rebuilds the loan counters from the transactions of the last window, shard by shard."""
+    from repayment.models import Transaction
+
+    counter = SlidingWindowCounter('loan')
+    now = time.time()
+    since = timezone.now() - datetime.timedelta(seconds=settings.VELOCITY_LIMITS['loan']['window'])
+    for shard in shard_aliases():
+        timestamps_by_loan = {}
+        for loan_id, created in Transaction.objects.using(shard).filter(created__gte=since).values_list('loan_id', 'created'):
+            timestamps_by_loan.setdefault(str(loan_id), []).append(created.timestamp())
+        counter.load(timestamps_by_loan, now)
+
+
+def _ensure_warm():
+    global _warmed
+    if not _warmed:
+        with _warm_lock:
+            if not _warmed:
+                warm_loan_counters()
+                _warmed = True
+
+
+def check_velocity(loan_id, client):
+    """
+    Raises VelocityExceeded if one more payment for the loan or from the client
+    would go over its 'max' for the window, and logs bursts reaching 'flag'.
+    """
+    _ensure_warm()
+    for scope, ident in (('loan', loan_id), ('client', client)):
+        limit = settings.VELOCITY_LIMITS[scope]
+        counter = SlidingWindowCounter(scope)
+        count = counter.count(ident) + 1
+        if count > limit['max']:
+            raise VelocityExceeded(scope, limit, math.ceil(counter.bucket_seconds))
+        if count >= limit['flag']:
+            logger.warning('Payment burst flagged: %s %s made %d payments in %ds', scope, ident, count, limit['window'])
+
+
+def record_payment(loan_id, client):
+    for scope, ident in (('loan', loan_id), ('client', client)):
+        SlidingWindowCounter(scope).add(ident)
@@ -1,16 +1,36 @@
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 import json
 from user.models import User, Loan
-from repayment.models import Payment, Transaction
-from repayment.tasks import update_next_emis
-from datetime import timedelta
+from repayment.models import Payment
+from repayment.serializers import payment_encoder
+from repayment.archive import get_loan_transactions
+from repayment.allocation import apply_payment
+from repayment import money
+from user import outbox
+from repayment.idempotency import IdempotentMixin
+from repayment import velocity
+from credit_card_service.sharding import shard_for_loan
+from credit_card_service.throttling import ClientRateThrottle, LoanRateThrottle, concurrency_limited
+from credit_card_service.rendering import static_page, stream_page
+from repayment.analytics import get_portfolio_stats
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from repayment import changes, ledger
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.conf import settings
 
+# Statement columns printed without HTML escaping: ids, amounts and dates
+PAYMENT_ROW_SAFE = ("payment_id", "loan", "emi_amount", "total_paid", "due_date")
+TRANSACTION_ROW_SAFE = ("transaction_id", "amount", "created")
 
-class MakePaymentView(APIView):
+
+class MakePaymentView(IdempotentMixin, APIView):
     """
     Handles loan payments.
     
@@ -19,7 +39,13 @@ class MakePaymentView(APIView):
     
     POST:
     - Processes the payment based on the input details.
+    - Retries sent with the same Idempotency-Key header get the original response back,
+      ahead of the rate limits and the concurrency gate.
+    - Rate limited per client and per loan; bursts beyond the limits get 429.
+    - Payment velocity per loan and per client is checked over a sliding window;
+      suspicious bursts are logged and those over the limit get 429.
     """
+    throttle_classes = [ClientRateThrottle, LoanRateThrottle]
 
     def handle_exception(self, exc):
         if isinstance(exc, KeyError):
@@ -32,6 +58,12 @@ class MakePaymentView(APIView):
                 data={"error": f"Not Found: {str(exc)}"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        if isinstance(exc, velocity.VelocityExceeded):
+            return Response(
+                data={"error": str(exc)},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(exc.retry_after)},
+            )
         if isinstance(exc, ValueError):
             return Response(
                 data={"error": str(exc)},
@@ -41,40 +73,9 @@ class MakePaymentView(APIView):
 
     def get(self, request):
         """Render an HTML form for making payments."""
-        html_content = """
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Make Payment</title>
-            <style>
-                body { font-family: Arial, sans-serif; background-color: #f9f9f9; color: #333; }
-                h1 { text-align: center; color: #4CAF50; margin-top: 20px; }
-                form { max-width: 500px; margin: 20px auto; padding: 20px; background: #fff; border: 1px solid #ddd; border-radius: 8px; }
-                label { display: block; margin-bottom: 5px; font-weight: bold; }
-                input { width: 100%; padding: 8px; margin-bottom: 10px; border: 1px solid #ddd; border-radius: 4px; }
-                button { display: block; width: 100%; padding: 10px; background-color: #4CAF50; color: white; border: none; border-radius: 4px; font-size: 16px; }
-                button:hover { background-color: #45a049; }
-                .error { color: red; text-align: center; margin-top: 10px; }
-            </style>
-        </head>
-        <body>
-            <h1>Make a Payment</h1>
-            <form method="POST" action="/api/make-payment/">
-                <label for="loan_id">Loan ID</label>
-                <input type="text" id="loan_id" name="loan_id" placeholder="Enter your Loan ID" required>
-                
-                <label for="amount">Payment Amount</label>
-                <input type="number" id="amount" name="amount" placeholder="Enter payment amount" required>
-                
-                <button type="submit">Submit Payment</button>
-            </form>
-        </body>
-        </html>
-        """
-        return HttpResponse(html_content, content_type="text/html")
+        return HttpResponse(static_page("repayment/make_payment.html"), content_type="text/html")
 
+    @concurrency_limited
     def post(self, request):
         try:
             # Parse input data
@@ -86,33 +87,39 @@ class MakePaymentView(APIView):
                 loan_id = data["loan_id"]
                 amount = round(data["amount"])
 
-            # Fetch the loan
-            loan = Loan.objects.get(loan_id=loan_id)
+            # Fetch the loan from its shard
+            using = shard_for_loan(loan_id)
+            loan = Loan.objects.using(using).get(loan_id=loan_id)
 
             if loan.loan_status in ["STOPPED", "REPAID"]:
                 raise ValueError("Loan cannot be processed. Status: " + loan.loan_status)
 
+            client = ClientRateThrottle().get_ident(request)
+            velocity.check_velocity(str(loan.loan_id), client)
+
             # Calculate due and process payment
-            total_due, duration_days = self.get_total_due_and_days(loan_id, loan.disbursement_date)
-            min_due = round(self.get_min_due(loan, duration_days))
+            total_due, _ = self.get_total_due_and_days(loan_id, loan.disbursement_date, using)
+            min_due = self.get_min_due(loan)
 
             if amount < min_due:
                 raise ValueError(f"Minimum due payment is {min_due}.")
 
-            self.pay_amount(amount, loan_id, min_due)
+            with transaction.atomic(using=using):
+                self.pay_amount(amount, loan_id, min_due)
 
-            # Trigger EMI updates if necessary
-            if amount > total_due:
-                update_next_emis.delay(loan_id)
+                # Trigger EMI updates if necessary, once the payment is committed
+                if amount > total_due:
+                    outbox.enqueue('repayment.tasks.update_next_emis', str(loan_id), key=loan_id, using=using)
+            velocity.record_payment(str(loan.loan_id), client)
 
             return Response(data={"message": "Payment processed successfully."}, status=status.HTTP_200_OK)
 
         except Exception as exc:
             return self.handle_exception(exc)
 
-    def get_total_due_and_days(self, loan_id, loan_disbursement_date):
+    def get_total_due_and_days(self, loan_id, loan_disbursement_date, using=None):
         """Calculate total due and days duration."""
-        all_payments = Payment.objects.filter(loan=loan_id)
+        all_payments = Payment.objects.using(using).filter(loan=loan_id)
         total_due = 0
         i = 0
 
@@ -122,7 +129,7 @@ class MakePaymentView(APIView):
             if payment.status == "PARTIALLY_COMPLETED":
                 total_due += payment.emi_amount - payment.total_paid
             elif payment.status == "DUE":
-                total_due += payment.emi_amount
+                total_due += payment.emi_amount - payment.total_paid
             i += 1
 
         if i == 0:
@@ -133,23 +140,13 @@ class MakePaymentView(APIView):
         
         return total_due, duration
 
-    def get_min_due(self, loan, days):
-        """Calculate the minimum due amount."""
-        return round((loan.principal_balance * 0.03) + (loan.principal_balance * days * loan.interest_rate / 365 / 100), 2)
+    def get_min_due(self, loan):
+        """The minimum due in whole rupees: 3% of the principal plus the interest accrued nightly."""
+        return money.to_rupees(money.principal_due(money.to_paise(loan.principal_balance)) + loan.accrued_interest)
 
     def pay_amount(self, amount, loan_id, min_due):
         """Handle the payment logic."""
-        loan = Loan.objects.get(loan_id=loan_id)
-        transaction = Transaction(loan=loan, amount=amount)
-        transaction.save()
-
-        # Process payments
-        if loan.principal_balance == amount:
-            loan.principal_balance = 0
-            loan.status = "REPAID"
-        else:
-            loan.principal_balance -= amount
-        loan.save()
+        apply_payment(loan_id, amount)
 
 
 class StatementView(APIView):
@@ -166,111 +163,102 @@ class StatementView(APIView):
 
         if not loan_id:
             # Render the form
-            html_content = """
-            <!DOCTYPE html>
-            <html lang="en">
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>Loan Account Statement</title>
-                <style>
-                    body { font-family: Arial, sans-serif; background-color: #f9f9f9; color: #333; padding: 20px; }
-                    h1 { text-align: center; color: #4CAF50; margin-bottom: 20px; }
-                    form { max-width: 400px; margin: 20px auto; padding: 20px; background: #fff; border: 1px solid #ddd; border-radius: 8px; }
-                    label { display: block; margin-bottom: 10px; font-weight: bold; }
-                    input { width: 100%; padding: 8px; margin-bottom: 20px; border: 1px solid #ddd; border-radius: 4px; }
-                    button { width: 100%; padding: 10px; background-color: #4CAF50; color: white; border: none; border-radius: 4px; font-size: 16px; }
-                    button:hover { background-color: #45a049; }
-                </style>
-            </head>
-            <body>
-                <h1>Loan Account Statement</h1>
-                <form method="get" action="">
-                    <label for="loan_id">Enter Loan ID</label>
-                    <input type="text" id="loan_id" name="loan_id" placeholder="Loan ID" required>
-                    <button type="submit">View Statement</button>
-                </form>
-            </body>
-            </html>
-            """
-            return HttpResponse(html_content, content_type="text/html")
-
-        # If a loan ID is provided, fetch the payment statement
-        payments = Payment.objects.filter(loan=loan_id)
+            return HttpResponse(static_page("repayment/statement_form.html"), content_type="text/html")
+
+        # If a loan ID is provided, fetch the payment statement from the loan's shard
+        try:
+            payments = Payment.objects.using(shard_for_loan(loan_id)).filter(loan=loan_id)
+        except ValueError:
+            payments = Payment.objects.none()
 
         if not payments.exists():
             # If no payments are found, show a message
-            html_content = f"""
-            <!DOCTYPE html>
-            <html lang="en">
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>Loan Account Statement</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; background-color: #f9f9f9; color: #333; padding: 20px; text-align: center; }}
-                    h1 {{ color: #4CAF50; }}
-                </style>
-            </head>
-            <body>
-                <h1>Loan Account Statement</h1>
-                <p>No payments found for Loan ID: {loan_id}</p>
-            </body>
-            </html>
-            """
-            return HttpResponse(html_content, content_type="text/html")
-
-        # If payments are found, display them in a table
-        account_statement = PaymentSerializer(payments, many=True).data
-        html_content = """
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Loan Account Statement</title>
-            <style>
-                body { font-family: Arial, sans-serif; background-color: #f9f9f9; color: #333; padding: 20px; }
-                h1 { text-align: center; color: #4CAF50; margin-bottom: 20px; }
-                table { width: 90%; margin: 0 auto; border-collapse: collapse; }
-                th, td { border: 1px solid #ddd; padding: 10px; text-align: center; }
-                th { background-color: #4CAF50; color: white; }
-                tr:nth-child(even) { background-color: #f2f2f2; }
-                tr:hover { background-color: #ddd; }
-            </style>
-        </head>
-        <body>
-            <h1>Loan Account Statement</h1>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Payment ID</th>
-                        <th>Loan ID</th>
-                        <th>EMI Amount</th>
-                        <th>Total Paid</th>
-                        <th>Status</th>
-                        <th>Due Date</th>
-                    </tr>
-                </thead>
-                <tbody>
-        """
-
-        for payment in account_statement:
-            html_content += f"""
-            <tr>
-                <td>{payment['payment_id']}</td>
-                <td>{payment['loan']}</td>
-                <td>{payment['emi_amount']}</td>
-                <td>{payment['total_paid']}</td>
-                <td>{payment['status']}</td>
-                <td>{payment['due_date']}</td>
-            </tr>
-            """
-
-        html_content += """
-                </tbody>
-            </table>
-        </body>
-        </html>
-        """
-        return HttpResponse(html_content, content_type="text/html")
+            return render(request, "repayment/statement_empty.html", {"loan_id": loan_id})
+
+        # If payments are found, display them in a table, followed by the
+        # loan's transactions (hot rows plus archived segments, newest first)
+        account_statement = payment_encoder.encode(payments)
+        page = stream_page("repayment/statement.html", [
+            ("payment_rows", "repayment/statement_payment_row.html", account_statement, PAYMENT_ROW_SAFE),
+            ("transaction_rows", "repayment/statement_transaction_row.html", get_loan_transactions(loan_id), TRANSACTION_ROW_SAFE),
+        ])
+        return StreamingHttpResponse(page, content_type="text/html")
+
+
+class PortfolioStatsView(APIView):
+    """
+    Serves portfolio analytics for the risk team.
+
+    GET:
+    - Returns the latest nightly snapshot grouped by billing day and loan type,
+      adjusted with the loans and collections recorded since it was taken.
+    """
+
+    def get(self, request):
+        stats = get_portfolio_stats()
+        if stats is None:
+            return Response(
+                data={"error": "No portfolio snapshot has been computed yet."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(data=stats, status=status.HTTP_200_OK)
+
+
+class LoanLedgerView(APIView):
+    """
+    Serves a loan's balances from its event ledger.
+
+    GET:
+    - ?loan_id=&at= returns the balances as of `at` (now by default).
+    - ?loan_id=&since=&until= rebuilds the statement for that window instead.
+    """
+
+    def get(self, request):
+        loan_id = request.GET.get("loan_id")
+        try:
+            at, since, until = (self.parse_time(request.GET.get(name)) for name in ("at", "since", "until"))
+            if since is not None or until is not None:
+                data = ledger.statement(loan_id, since, until)
+                found = data["closing"]["sequence"]
+            else:
+                data = ledger.balance_at(loan_id, at)
+                found = data["sequence"]
+        except (TypeError, ValueError) as exc:
+            return Response(data={"error": f"Invalid query: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+        if not found:
+            return Response(data={"error": f"No ledger events for loan {loan_id}."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data={"loan_id": loan_id, **data}, status=status.HTTP_200_OK)
+
+    def parse_time(self, value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            # A bare date means the end of that day
+            day = parse_date(value)
+            parsed = datetime.combine(day, time.max) if day else None
+        if parsed is None:
+            raise ValueError(f"{value!r} is not an ISO date or datetime.")
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+class ChangesView(APIView):
+    """
+    Serves the change feed, for partners and the warehouse to sync loans, payments and transactions.
+
+    GET:
+    - ?since=<cursor> returns the rows written after the cursor, in the order they were written,
+      grouped by kind, with the cursor to ask for next and whether more rows are waiting.
+      Without `since` the feed starts from the beginning.
+    - ?limit= caps the rows in the page, at most CHANGE_FEED_PAGE_SIZE (the default).
+    """
+
+    def get(self, request):
+        try:
+            limit = int(request.GET.get("limit") or settings.CHANGE_FEED_PAGE_SIZE)
+            if limit <= 0:
+                raise ValueError("limit must be positive.")
+            data = changes.changes_since(request.GET.get("since"), min(limit, settings.CHANGE_FEED_PAGE_SIZE))
+        except ValueError as exc:
+            return Response(data={"error": f"Invalid query: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data=data, status=status.HTTP_200_OK)
@@ -1,6 +1,68 @@
 from django.contrib import admin
-from user.models import User, Loan
+from credit_card_service.paginators import EstimatedCountPaginator
+from user.models import User, Loan, PreApprovedOffer
+
+# Bulk actions only enqueue work on the batch queue; the request never runs it.
+# The selection is sent as lists of ids, one task per chunk, not one task per row.
+BULK_ACTION_QUEUE = 'batch'
+BULK_ACTION_CHUNK_SIZE = 1000
+
+
+def queue_in_chunks(task, ids):
+    for i in range(0, len(ids), BULK_ACTION_CHUNK_SIZE):
+        task.apply_async((ids[i:i + BULK_ACTION_CHUNK_SIZE],), queue=BULK_ACTION_QUEUE)
+
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ('user_id', 'name', 'aadhar_number', 'email', 'annual_income', 'created', 'billing_day', 'credit_score')
+    list_filter = ('billing_day',)
+    ordering = ('user_id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('rescore_users',)
+
+    @admin.action(description='Re-score selected users in the background')
+    def rescore_users(self, request, queryset):
+        from user.tasks import update_credit_scores
+        aadhar_numbers = [int(aadhar_number) for aadhar_number in queryset.values_list('aadhar_number', flat=True)]
+        queue_in_chunks(update_credit_scores, aadhar_numbers)
+        self.message_user(request, f'Queued credit score updates for {len(aadhar_numbers)} users.')
+
+
+@admin.register(Loan)
+class LoanAdmin(admin.ModelAdmin):
+    list_display = ('loan_id', 'user', 'loan_type', 'loan_amount', 'principal_balance', 'disbursement_date', 'loan_status')
+    list_select_related = ('user',)
+    list_filter = ('loan_status', 'loan_type')
+    raw_id_fields = ('user',)
+    ordering = ('-created', 'loan_id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('recompute_emis', 'rebill_loans')
+
+    def loan_ids(self, queryset):
+        return [str(loan_id) for loan_id in queryset.values_list('loan_id', flat=True)]
+
+    @admin.action(description='Recompute EMIs for selected loans in the background')
+    def recompute_emis(self, request, queryset):
+        from repayment.tasks import recompute_emis
+        loan_ids = self.loan_ids(queryset)
+        queue_in_chunks(recompute_emis, loan_ids)
+        self.message_user(request, f'Queued EMI recomputation for {len(loan_ids)} loans.')
+
+    @admin.action(description='Re-bill selected loans in the background')
+    def rebill_loans(self, request, queryset):
+        from repayment.tasks import rebill_loans
+        loan_ids = self.loan_ids(queryset)
+        queue_in_chunks(rebill_loans, loan_ids)
+        self.message_user(request, f'Queued re-billing for {len(loan_ids)} loans.')
+
+
+@admin.register(PreApprovedOffer)
+class PreApprovedOfferAdmin(admin.ModelAdmin):
+    list_display = ('user', 'offer_amount', 'created')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
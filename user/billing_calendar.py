@@ -0,0 +1,18 @@
+import hashlib
+from django.conf import settings
+
+
+def billing_slice_for(user_id):
+    """
+    Maps a user to a (billing_day, billing_slot) pair.
+
+    Billing days run from 1 to BILLING_DAYS (28, so every day exists in every
+    month) and slots are hourly slices of that day. The slice comes from a
+    SHA-256 of the user's UUID rather than the UUID itself: shards are picked
+    by user_id.int modulo the shard count, which divides 28 * 24 for most
+    shard counts, so the same number would put each slice on a single shard.
+    """
+    days = settings.BILLING_DAYS
+    slots = settings.BILLING_SLOTS_PER_DAY
+    bucket = int.from_bytes(hashlib.sha256(user_id.bytes).digest()[:8], 'big') % (days * slots)
+    return bucket // slots + 1, bucket % slots
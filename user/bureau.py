@@ -0,0 +1,164 @@
+"""
+Bulk credit scoring from a bureau transactions file (aadhar_id, credit, debit).
+
+The file is split into byte ranges that worker processes parse in blocks,
+summing credit and debit per Aadhaar number. Each worker splits its sums into
+partitions by a hash of the Aadhaar number and spools every partition to its
+own file. The parent then takes one partition at a time, merges its spool
+files, scores it with the same rules as calculate_credit_score and writes it
+back with batched bulk updates before reading the next, so it holds a single
+partition in memory. pandas and numpy are imported lazily.
+"""
+import glob
+import io
+import os
+import tempfile
+
+BLOCK_SIZE = 16 * 1024 * 1024  # Bytes parsed at a time by a worker
+UPDATE_BATCH_SIZE = 5000
+COLUMNS = ('aadhar_id', 'credit', 'debit')
+
+
+def score_for_balance(account_balance):
+    """The bureau scoring rule: 300 to 900 depending on the account balance."""
+    if account_balance >= 1000000:
+        return 900
+    if account_balance <= 10000:
+        return 300
+    return 300 + (account_balance - 10000) // 1500
+
+
+def scores_for_balances(account_balances):
+    """Vectorized score_for_balance over a numpy array of balances."""
+    import numpy as np
+    scores = 300 + (account_balances - 10000) // 1500
+    return np.where(account_balances >= 1000000, 900, np.where(account_balances <= 10000, 300, scores))
+
+
+def partition_of(aadhar_ids, partitions):
+    """Stable hash partition of integer Aadhaar numbers."""
+    return aadhar_ids % partitions
+
+
+def byte_ranges(path, parts):
+    """Splits the file after its header line into `parts` byte ranges."""
+    with open(path, 'rb') as bureau_file:
+        header = bureau_file.readline()
+        data_start = bureau_file.tell()
+    size = os.path.getsize(path)
+    step = max((size - data_start) // parts, 1)
+    bounds = [data_start + i * step for i in range(parts)] + [size]
+    return header.decode().strip().split(','), [
+        (bounds[i], bounds[i + 1]) for i in range(parts) if bounds[i] < bounds[i + 1]
+    ]
+
+
+def iter_blocks(path, start, end, block_size=BLOCK_SIZE):
+    """
+    Yields the whole lines that start inside [start, end), about `block_size` bytes at a time.
+    A line crossing `start` belongs to the previous range.
+    """
+    with open(path, 'rb') as bureau_file:
+        if start > 0:
+            bureau_file.seek(start - 1)
+            if bureau_file.read(1) != b'\n':
+                bureau_file.readline()
+        while bureau_file.tell() < end:
+            block = bureau_file.read(min(block_size, end - bureau_file.tell()))
+            if not block:
+                return
+            if not block.endswith(b'\n'):
+                block += bureau_file.readline()
+            yield block
+
+
+def sum_range(path, header, start, end, partitions, spool_dir, block_size=BLOCK_SIZE):
+    """
+    Worker: sums credit and debit per Aadhaar number over one byte range and
+    spools the (aadhar_id-indexed) sums of each partition to a file in `spool_dir`.
+    """
+    import pandas as pd
+
+    totals = None
+    for block in iter_blocks(path, start, end, block_size):
+        rows = pd.read_csv(io.BytesIO(block), header=None, names=header, usecols=list(COLUMNS))
+        sums = rows.groupby('aadhar_id')[['credit', 'debit']].sum()
+        totals = sums if totals is None else totals.add(sums, fill_value=0)
+
+    if totals is None:
+        return
+    keys = partition_of(totals.index.to_numpy(), partitions)
+    for partition in range(partitions):
+        partial = totals[keys == partition]
+        if not partial.empty:
+            partial.to_pickle(spool_path(spool_dir, partition, start))
+
+
+def _sum_range(args):
+    return sum_range(*args)
+
+
+def spool_path(spool_dir, partition, start):
+    return os.path.join(spool_dir, f'{partition}-{start}.pkl')
+
+
+def merge_partition(spool_dir, partition):
+    """Sums the spooled partials of one partition. Returns None when no range had any."""
+    import pandas as pd
+
+    paths = glob.glob(spool_path(spool_dir, partition, '*'))
+    if not paths:
+        return None
+    return pd.concat([pd.read_pickle(path) for path in paths]).groupby(level=0).sum()
+
+
+def write_scores(totals, batch_size=UPDATE_BATCH_SIZE):
+    """Scores one partition of merged sums and saves them with bulk updates. Returns users updated."""
+    from credit_card_service.sharding import shard_aliases
+    from user.models import User
+
+    balances = (totals['credit'] - totals['debit']).to_numpy()
+    scores = dict(zip((str(aadhar_id) for aadhar_id in totals.index), scores_for_balances(balances).tolist()))
+    aadhar_numbers = list(scores)
+
+    updated = 0
+    for i in range(0, len(aadhar_numbers), batch_size):
+        batch = aadhar_numbers[i:i + batch_size]
+        # Users are sharded by user_id, so each batch is looked up on every shard.
+        for shard in shard_aliases():
+            users = list(User.objects.using(shard).filter(aadhar_number__in=batch).only('user_id', 'aadhar_number'))
+            for user in users:
+                user.credit_score = int(scores[user.aadhar_number])
+            # bulk_update skips User.save, so no per-user credit score task is queued.
+            User.objects.using(shard).bulk_update(users, ['credit_score'], batch_size=batch_size)
+            updated += len(users)
+    return updated
+
+
+def score_bureau_file(path, workers=None, partitions=None, block_size=BLOCK_SIZE, batch_size=UPDATE_BATCH_SIZE):
+    """
+    Rescores every user found in the bureau file at `path`.
+    Returns (distinct Aadhaar numbers in the file, users updated).
+    """
+    import multiprocessing
+
+    workers = workers or os.cpu_count() or 1
+    partitions = partitions or workers
+    header, ranges = byte_ranges(path, workers)
+
+    customers = updated = 0
+    with tempfile.TemporaryDirectory(prefix='bureau-') as spool_dir:
+        jobs = [(str(path), header, start, end, partitions, spool_dir, block_size) for start, end in ranges]
+        if workers == 1:
+            for job in jobs:
+                sum_range(*job)
+        else:
+            with multiprocessing.get_context('spawn').Pool(workers) as pool:
+                pool.map(_sum_range, jobs)
+
+        for partition in range(partitions):
+            totals = merge_partition(spool_dir, partition)
+            if totals is not None:
+                customers += len(totals)
+                updated += write_scores(totals, batch_size)
+    return customers, updated
@@ -0,0 +1,87 @@
+# Minimum values a user must meet to be offered a credit card loan.
+# Each rule is (user field, minimum allowed value, decline message).
+ELIGIBILITY_RULES = (
+    ("credit_score", 450, "Loan declined. Credit score is too low."),
+    ("annual_income", 150000, "Loan declined. Annual income is too low."),
+)
+
+MAX_LOAN_AMOUNT = 5000
+LOAN_AMOUNT_DECLINED = "Loan declined. Loan amount exceeds ₹5000."
+
+CHUNK_SIZE = 10000
+
+
+def check_eligibility(user, loan_amount):
+    """
+    Applies the eligibility rules to a single loan application.
+    Returns the decline message, or None if the application is eligible.
+    """
+    for field, minimum, message in ELIGIBILITY_RULES:
+        if getattr(user, field) < minimum:
+            return message
+    if loan_amount > MAX_LOAN_AMOUNT:
+        return LOAN_AMOUNT_DECLINED
+    return None
+
+
+def eligible_mask(columns):
+    """
+    Vectorized version of the eligibility rules.
+    `columns` maps each rule field to a numpy array, one entry per user.
+    """
+    mask = None
+    for field, minimum, _ in ELIGIBILITY_RULES:
+        passed = columns[field] >= minimum
+        mask = passed if mask is None else mask & passed
+    return mask
+
+
+def iter_user_chunks(chunk_size=CHUNK_SIZE, using=None):
+    """
+    Yields (user_ids, columns) for every user of a database, `chunk_size` rows at a time.
+    Uses keyset pagination on the primary key so each chunk is one indexed query.
+    """
+    import numpy as np
+    from user.models import User
+
+    fields = [field for field, _, _ in ELIGIBILITY_RULES]
+    queryset = User.objects.using(using).order_by("user_id").values_list("user_id", *fields)
+    last_id = None
+
+    while True:
+        page = queryset if last_id is None else queryset.filter(user_id__gt=last_id)
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+        user_ids = [row[0] for row in rows]
+        columns = {
+            field: np.fromiter((row[i + 1] for row in rows), dtype=np.int64, count=len(rows))
+            for i, field in enumerate(fields)
+        }
+        yield user_ids, columns
+        last_id = user_ids[-1]
+
+
+def generate_pre_approved_offers(chunk_size=CHUNK_SIZE):
+    """
+    Rebuilds the PreApprovedOffer table for the whole customer base, shard by shard.
+    Returns the number of offers created.
+    """
+    import numpy as np
+    from django.db import transaction
+    from credit_card_service.sharding import shard_aliases
+    from user.models import PreApprovedOffer
+
+    created = 0
+    for shard in shard_aliases():
+        with transaction.atomic(using=shard):
+            PreApprovedOffer.objects.using(shard).all().delete()
+            for user_ids, columns in iter_user_chunks(chunk_size, shard):
+                mask = eligible_mask(columns)
+                offers = [
+                    PreApprovedOffer(user_id=user_ids[i], offer_amount=MAX_LOAN_AMOUNT)
+                    for i in np.flatnonzero(mask)
+                ]
+                PreApprovedOffer.objects.using(shard).bulk_create(offers, batch_size=chunk_size)
+                created += len(offers)
+    return created
@@ -0,0 +1,13 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from credit_card_service.sharding import all_aliases
+
+
+class Command(BaseCommand):
+    help = "Runs migrate on the default database and on every database in LOAN_SHARDS."
+
+    def handle(self, *args, **options):
+        for alias in all_aliases():
+            self.stdout.write(f"Migrating {alias}")
+            call_command("migrate", database=alias, verbosity=options["verbosity"])
@@ -0,0 +1,24 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from user.outbox import drain_all
+
+
+class Command(BaseCommand):
+    help = "Sends the Celery tasks waiting in the outbox. With --forever, keeps polling it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--forever", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument("--interval", type=float, default=settings.OUTBOX_POLL_INTERVAL)
+
+    def handle(self, *args, **options):
+        while True:
+            drained, sent = drain_all(options["batch_size"])
+            if drained:
+                self.stdout.write(f"drained={drained} sent={sent}")
+            if not options["forever"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user.bureau import BLOCK_SIZE, UPDATE_BATCH_SIZE, score_bureau_file
+from user.tasks import TRANSACTIONS_CSV
+
+
+class Command(BaseCommand):
+    help = (
+        "Rescores every user in a bureau transactions file (aadhar_id, credit, debit). "
+        "The file is summed in parallel by a process pool, a block at a time, and the "
+        "scores are written back with batched updates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default=str(TRANSACTIONS_CSV))
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+        parser.add_argument("--partitions", type=int, default=None, help="Aadhaar hash partitions, scored and written one at a time (default: --workers).")
+        parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="Bytes a worker parses at a time.")
+        parser.add_argument("--batch-size", type=int, default=UPDATE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            customers, updated = score_bureau_file(
+                options["path"], options["workers"], options["partitions"], options["block_size"], options["batch_size"],
+            )
+        except FileNotFoundError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"customers in file={customers} users updated={updated} in {elapsed:.2f}s")
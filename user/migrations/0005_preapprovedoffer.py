@@ -0,0 +1,29 @@
+# Generated by Django 5.0 on 2026-10-19 01:00
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_loan_loan_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='credit_score',
+            field=models.IntegerField(default=-1),
+        ),
+        migrations.CreateModel(
+            name='PreApprovedOffer',
+            fields=[
+                ('offer_id', models.UUIDField(default=uuid.uuid4, primary_key=True, serialize=False)),
+                ('offer_amount', models.IntegerField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.user')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0005_preapprovedoffer'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loan',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
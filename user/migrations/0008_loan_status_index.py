@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 01:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0007_user_billing_slot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loan',
+            name='loan_status',
+            field=models.CharField(choices=[('ACTIVE', 'ACTIVE'), ('STOPPED', 'STOPPED'), ('REPAID', 'REPAID')], db_index=True, default='ACTIVE', max_length=100),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0 on 2026-10-19 01:49
+
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def start_accrual(apps, schema_editor):
+    # Interest starts accruing from each loan's last payment, or its disbursement.
+    db_alias = schema_editor.connection.alias
+    Loan = apps.get_model('user', 'Loan')
+    Transaction = apps.get_model('repayment', 'Transaction')
+    last_payment = Transaction.objects.using(db_alias).filter(loan=OuterRef('pk')).values('loan').annotate(
+        last=Max('created'),
+    ).values('last')
+    Loan.objects.using(db_alias).update(
+        interest_accrued_through=Coalesce(TruncDate(Subquery(last_payment)), F('disbursement_date')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0009_outboxmessage'),
+        ('repayment', '0009_loan_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='accrued_interest',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='interest_accrued_through',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(start_accrual, migrations.RunPython.noop, hints={'model_name': 'loan'}),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0 on 2026-10-19 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0010_loan_accrued_interest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['change_seq', 'loan_id'], name='user_loan_change__9d71d8_idx'),
+        ),
+    ]
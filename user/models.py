@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, router, transaction
 import uuid
-from datetime import timedelta
-from user.tasks import update_credit_score
+from user.billing_calendar import billing_slice_for
+from user import outbox
+from credit_card_service.sharding import aligned_loan_id
+from repayment.changes import ChangeTracked
+from repayment.ledger import disbursement_event, record_events
 
 class User(models.Model):
     user_id = models.UUIDField(primary_key=True, default=uuid.uuid4)
@@ -11,16 +14,22 @@ class User(models.Model):
     annual_income = models.IntegerField()
     created = models.DateTimeField(auto_now_add=True)
     billing_day = models.IntegerField(default=1)
+    billing_slot = models.IntegerField(default=0)  # Hour of the billing day this user is billed in
     credit_score = models.IntegerField(default=-1)
 
+    class Meta:
+        indexes = [models.Index(fields=['billing_day', 'billing_slot'])]
+
     def save(self, *args, **kwargs):
-        billing_date = self.created + timedelta(days=30)
-        self.billing_day = billing_date.day % 28
-        super().save(*args, **kwargs)
-        if self.credit_score == -1:
-            update_credit_score.delay(int(self.aadhar_number))
+        self.billing_day, self.billing_slot = billing_slice_for(self.user_id)
+        using = kwargs.get('using') or router.db_for_write(User, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if self.credit_score == -1:
+                # Sent by the outbox relay once the user row is committed
+                outbox.enqueue('user.tasks.update_credit_score', int(self.aadhar_number), key=self.aadhar_number, using=using)
 
-class Loan(models.Model):
+class Loan(ChangeTracked, models.Model):
 
     LOAN_TYPES = (("Home Loan", "Home Loan"), ("Personal Loan","Personal Loan"), ("Car Loan", "Car Loan"))
 
@@ -38,5 +47,44 @@ class Loan(models.Model):
     term_period = models.IntegerField()
     disbursement_date = models.DateField()
     principal_balance = models.IntegerField()
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    loan_status = models.CharField(choices=LOAN_STATUS, max_length=100, default='ACTIVE', db_index=True)
+    # Interest in paise accrued by the nightly job (repayment.accrual) and not yet covered by a payment
+    accrued_interest = models.BigIntegerField(default=0)
+    interest_accrued_through = models.DateField(null=True, blank=True)  # Last day included in accrued_interest
+    change_seq = models.BigIntegerField(default=0)  # See repayment.changes
+
+    class Meta:
+        indexes = [models.Index(fields=['change_seq', 'loan_id'])]
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if adding:
+            # Lets the loan's shard be found from its id alone
+            self.loan_id = aligned_loan_id(self.loan_id, self.user_id)
+            if self.interest_accrued_through is None:
+                self.interest_accrued_through = self.disbursement_date
+        using = kwargs.get('using') or router.db_for_write(Loan, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if adding:
+                # Opens the loan's ledger, in the transaction that creates the loan
+                record_events([disbursement_event(self)], using)
+
+class PreApprovedOffer(models.Model):
+    offer_id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    offer_amount = models.IntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+class OutboxMessage(models.Model):
+    """
+    A Celery task waiting to be sent by the outbox relay (see user.outbox).
+    """
+    task = models.CharField(max_length=255)
+    key = models.CharField(max_length=255, blank=True)  # Pending messages with the same task and key are sent once
+    args = models.JSONField(default=list)
     created = models.DateTimeField(auto_now_add=True)
-    loan_status = models.CharField(choices=LOAN_STATUS, max_length=100, default='ACTIVE')
\ No newline at end of file
+    # Set while a relay is sending it
+    claim = models.UUIDField(null=True, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
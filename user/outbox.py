@@ -0,0 +1,114 @@
+"""
+Transactional outbox for Celery tasks.
+
+Code that needs a task run after a DB change calls `enqueue` instead of
+`.delay`: the task is stored as an OutboxMessage in the same transaction as
+the change, so it is only sent if the change commits and never reads
+uncommitted rows. After the commit a per-process relay thread drains the
+outbox in batches, sending each (task, key) once however many times it was
+queued, so requests never wait on the broker. A batch is claimed for
+OUTBOX_CLAIM_TIMEOUT seconds by a single UPDATE and sent after that commits,
+so no locks are held while the broker (or an eager task) runs; a batch whose
+relay died before deleting it is sent again once the claim expires. The
+`relay_outbox` beat task and management command sweep up anything a process
+left behind.
+"""
+import datetime
+import threading
+import uuid
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from credit_card_service.sharding import all_aliases
+
+_relay = None
+_relay_lock = threading.Lock()
+
+
+def enqueue(task_name, *args, key=None, using=DEFAULT_DB_ALIAS):
+    """
+    Queues `task_name` (a dotted task path) with `args` in the current transaction on `using`.
+    Messages with the same task and key that are still pending are sent once, with the latest args.
+    """
+    from user.models import OutboxMessage
+
+    OutboxMessage.objects.using(using).create(task=task_name, key='' if key is None else str(key), args=list(args))
+    transaction.on_commit(wake_relay, using=using)
+
+
+def drain(batch_size=None, using=DEFAULT_DB_ALIAS):
+    """
+    Sends one batch of pending messages from the outbox on `using` and deletes them.
+    Returns (messages drained, tasks sent).
+    """
+    from django.utils.module_loading import import_string
+    from credit_card_service.celery import app
+    from user.models import OutboxMessage
+
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    now = timezone.now()
+    claim = uuid.uuid4()
+    outbox = OutboxMessage.objects.using(using)
+    # Claimed with one UPDATE, committed before anything is sent
+    unclaimed = Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+    outbox.filter(unclaimed, id__in=outbox.filter(unclaimed).order_by('id').values('id')[:batch_size]).update(
+        claim=claim, claimed_until=now + datetime.timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT),
+    )
+    messages = list(outbox.filter(claim=claim).order_by('id'))
+    if not messages:
+        return 0, 0
+
+    latest = {}
+    for message in messages:
+        latest[(message.task, message.key or message.id)] = message
+
+    with app.producer_or_acquire() as producer:
+        for message in latest.values():
+            import_string(message.task).apply_async(message.args, producer=producer)
+
+    outbox.filter(claim=claim).delete()
+    return len(messages), len(latest)
+
+
+def drain_all(batch_size=None):
+    """Drains the outbox of every database until it is empty. Returns (messages drained, tasks sent)."""
+    drained = sent = 0
+    for using in all_aliases():
+        while True:
+            batch_drained, batch_sent = drain(batch_size, using)
+            if not batch_drained:
+                break
+            drained += batch_drained
+            sent += batch_sent
+    return drained, sent
+
+
+class Relay(threading.Thread):
+    """Drains the outbox whenever a transaction that enqueued a task commits."""
+
+    def __init__(self):
+        super().__init__(name='outbox-relay', daemon=True)
+        self.pending = threading.Event()
+
+    def run(self):
+        while True:
+            self.pending.wait(settings.OUTBOX_POLL_INTERVAL)
+            self.pending.clear()
+            try:
+                drain_all()
+            except Exception as exc:
+                # Messages stay in the outbox and are retried on the next wake-up.
+                print('Outbox relay failed:', exc)
+            finally:
+                connections.close_all()
+
+
+def wake_relay():
+    global _relay
+    if _relay is None:
+        with _relay_lock:
+            if _relay is None:
+                _relay = Relay()
+                _relay.start()
+    _relay.pending.set()
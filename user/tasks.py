@@ -1,10 +1,19 @@
-import pandas as pd
-from celery import shared_task
+from functools import lru_cache
+from pathlib import Path
+from credit_card_service.celery import app
+from user.bureau import score_for_balance
 
-df = pd.read_csv('./user/transactions.csv')
+TRANSACTIONS_CSV = Path(__file__).resolve().parent / 'transactions.csv'
+
+@lru_cache(maxsize=None)
+def get_transactions():
+    # pandas and the CSV are loaded on first use, in the worker, so that the
+    # web process never pays for them.
+    import pandas as pd
+    return pd.read_csv(TRANSACTIONS_CSV)
 
 def calculate_credit_score(aadhar_id):
-    
+    df = get_transactions()
     cur_df = df.loc[df['aadhar_id'] == aadhar_id]
 
     if len(cur_df) == 0: # User not found
@@ -15,22 +24,32 @@ def calculate_credit_score(aadhar_id):
 
     account_balance = total_credit - total_debit
 
-    if account_balance >= 1000000:
-        return 900
-    if account_balance <= 10000:
-        return 300
-
-    credit_score = 300 +  (account_balance - 10000) // 1500
-
-    return credit_score
+    return score_for_balance(account_balance)
 
-@shared_task()
+@app.task()
 def update_credit_score(aadhar_id):
     credit_score = calculate_credit_score(aadhar_id)
     from .models import User
-    user = User.objects.get(aadhar_number = aadhar_id)
-    user.credit_score = credit_score
-    user.save()
-
-
-
+    from credit_card_service.sharding import shard_aliases
+    # update() rather than save(), so that a score of -1 does not queue this task again.
+    # Users are sharded by user_id, so every shard is asked for the Aadhaar number.
+    for shard in shard_aliases():
+        User.objects.using(shard).filter(aadhar_number=aadhar_id).update(credit_score=credit_score)
+
+@app.task()
+def update_credit_scores(aadhar_ids):
+    # Re-scores a list of users in one task, e.g. from the admin.
+    for aadhar_id in aadhar_ids:
+        update_credit_score(aadhar_id)
+
+@app.task()
+def generate_pre_approved_offers():
+    from .eligibility import generate_pre_approved_offers as generate
+    created = generate()
+    print('Pre-approved offers generated:', created)
+
+@app.task()
+def relay_outbox():
+    from .outbox import drain_all
+    drained, sent = drain_all()
+    print('Outbox messages drained:', drained, 'tasks sent:', sent)
@@ -0,0 +1,158 @@
+import datetime
+import os
+import random
+import tempfile
+import uuid
+from collections import Counter
+from unittest import mock
+
+from django.contrib import admin
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from credit_card_service.celery import app
+from credit_card_service.sharding import shard_for_user
+from repayment.tasks import get_loans_billing_slice
+from user import bureau, outbox
+from user.billing_calendar import billing_slice_for
+from user.models import Loan, OutboxMessage, User
+
+
+class OutboxDrainTests(TestCase):
+    """A batch is claimed before it is sent, and sent once per task and key."""
+
+    def setUp(self):
+        producer = mock.patch.object(app, 'producer_or_acquire')
+        producer.start()
+        self.addCleanup(producer.stop)
+
+    def test_batch_is_claimed_before_sending(self):
+        for _ in range(3):
+            outbox.enqueue('user.tasks.update_credit_score', 123, key='123')
+
+        def apply_async(args, producer=None):
+            # Sending sees its batch already claimed, so the claim was written first
+            self.assertEqual(OutboxMessage.objects.filter(claimed_until__isnull=True).count(), 0)
+
+        with mock.patch('user.tasks.update_credit_score.apply_async', side_effect=apply_async) as sent:
+            self.assertEqual(outbox.drain(), (3, 1))
+        sent.assert_called_once()
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_expired_claim_is_sent_again(self):
+        outbox.enqueue('user.tasks.update_credit_score', 123, key='123')
+        OutboxMessage.objects.update(claimed_until=timezone.now() + datetime.timedelta(minutes=1))
+        with mock.patch('user.tasks.update_credit_score.apply_async') as sent:
+            self.assertEqual(outbox.drain(), (0, 0))
+            OutboxMessage.objects.update(claimed_until=timezone.now() - datetime.timedelta(seconds=1))
+            self.assertEqual(outbox.drain(), (1, 1))
+        sent.assert_called_once()
+
+
+class RegisterPageTests(TestCase):
+    def test_user_names_are_escaped(self):
+        User.objects.bulk_create([
+            User(name='<b>x</b>', aadhar_number='123412341234', email='a@example.com', annual_income=1, credit_score=700),
+        ])
+        page = b''.join(self.client.get('/api/register-user/').streaming_content).decode()
+        self.assertIn('&lt;b&gt;x&lt;/b&gt;', page)
+        self.assertNotIn('<b>x</b>', page)
+
+
+class BulkAdminActionTests(TestCase):
+    def test_rescore_sends_one_task_per_chunk(self):
+        User.objects.bulk_create([
+            User(name=str(n), aadhar_number=f'12341234123{n}', email=f'{n}@example.com', annual_income=1, credit_score=700)
+            for n in range(3)
+        ])
+        user_admin = admin.site._registry[User]
+        with mock.patch('user.admin.BULK_ACTION_CHUNK_SIZE', 2), \
+                mock.patch('user.tasks.update_credit_scores.apply_async') as sent, \
+                mock.patch.object(user_admin, 'message_user'):
+            user_admin.rescore_users(None, User.objects.order_by('aadhar_number'))
+        self.assertEqual(
+            [call.args[0] for call in sent.call_args_list],
+            [([123412341230, 123412341231],), ([123412341232],)],
+        )
+
+
+class BillingSliceTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.user_ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(20000)]
+
+    def test_users_are_spread_over_every_day_and_slot(self):
+        slices = Counter(billing_slice_for(user_id) for user_id in self.user_ids)
+        self.assertEqual(len(slices), 28 * 24)
+        self.assertEqual({day for day, _ in slices}, set(range(1, 29)))
+        self.assertEqual({slot for _, slot in slices}, set(range(24)))
+        self.assertLess(max(slices.values()), 2 * len(self.user_ids) / len(slices))
+
+    @override_settings(LOAN_SHARDS=('default', 'shard1', 'shard2', 'shard3'))
+    def test_each_slot_is_spread_over_every_shard(self):
+        by_slot = {}
+        for user_id in self.user_ids:
+            by_slot.setdefault(billing_slice_for(user_id)[1], Counter())[shard_for_user(user_id)] += 1
+        for slot, shards in by_slot.items():
+            self.assertEqual(len(shards), 4, slot)
+            self.assertLess(max(shards.values()) / min(shards.values()), 1.5, slot)
+
+
+class BillingScheduleTests(TestCase):
+    def test_beat_bills_one_slot_an_hour(self):
+        entries = {name: entry for name, entry in app.conf.beat_schedule.items() if name.startswith('billing-slot-')}
+        self.assertEqual(len(entries), 24)
+        for slot in range(24):
+            entry = entries['billing-slot-%02d' % slot]
+            self.assertEqual(entry['task'], 'repayment.tasks.billing_queue')
+            self.assertEqual(entry['args'], (slot,))
+            self.assertEqual((entry['schedule'].hour, entry['schedule'].minute), ({slot}, {0}))
+
+    def test_slice_holds_only_the_loans_of_its_day_and_slot(self):
+        loans = {}
+        for i in range(3):
+            user = User(name=f'u{i}', aadhar_number=f'12341234123{i}', email=f'u{i}@example.com', annual_income=200000, credit_score=700)
+            user.save()
+            loan = Loan(user=user, loan_amount=5000, loan_type='Credit Card', interest_rate=12, term_period=12,
+                        disbursement_date=datetime.date(2026, 1, 1), principal_balance=5000)
+            loan.save()
+            loans[loan.loan_id] = (user.billing_day, user.billing_slot)
+        for loan_id, (day, slot) in loans.items():
+            billed = {loan.loan_id for loan in get_loans_billing_slice(day, slot)}
+            self.assertEqual(billed, {other for other, other_slice in loans.items() if other_slice == (day, slot)})
+            self.assertIn(loan_id, billed)
+
+
+class BureauScoringTests(TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.rows = [(123412341230 + rng.randrange(6), rng.randrange(100000), rng.randrange(50000)) for _ in range(200)]
+        handle, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as bureau_file:
+            bureau_file.write('aadhar_id,credit,debit\n')
+            bureau_file.writelines(f'{aadhar},{credit},{debit}\n' for aadhar, credit, debit in self.rows)
+        self.addCleanup(os.remove, self.path)
+
+    def test_byte_ranges_cover_every_line_once(self):
+        header, ranges = bureau.byte_ranges(self.path, 7)
+        self.assertEqual(header, ['aadhar_id', 'credit', 'debit'])
+        lines = [line for start, end in ranges for block in bureau.iter_blocks(self.path, start, end, block_size=50) for line in block.decode().splitlines()]
+        self.assertEqual(lines, [f'{aadhar},{credit},{debit}' for aadhar, credit, debit in self.rows])
+
+    def test_vectorized_scores_match_the_scoring_rule(self):
+        import numpy as np
+        balances = [-5, 0, 10000, 10001, 11500, 500000, 999999, 1000000, 2000000]
+        self.assertEqual(bureau.scores_for_balances(np.array(balances)).tolist(), [bureau.score_for_balance(b) for b in balances])
+
+    def test_file_is_scored_per_customer(self):
+        for i in range(5):  # The sixth Aadhaar number in the file has no user
+            User(name=f'u{i}', aadhar_number=str(123412341230 + i), email=f'u{i}@example.com', annual_income=200000, credit_score=700).save()
+        balances = Counter()
+        for aadhar, credit, debit in self.rows:
+            balances[str(aadhar)] += credit - debit
+
+        self.assertEqual(bureau.score_bureau_file(self.path, workers=1, partitions=3, block_size=50, batch_size=2), (6, 5))
+        self.assertEqual(
+            dict(User.objects.values_list('aadhar_number', 'credit_score')),
+            {aadhar: bureau.score_for_balance(balance) for aadhar, balance in balances.items() if aadhar != '123412341235'},
+        )
@@ -1,9 +1,13 @@
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from user.models import User, Loan
-from user.tasks import calculate_credit_score
+from user.eligibility import check_eligibility
+from credit_card_service.rendering import stream_page
+from credit_card_service.throttling import ClientRateThrottle, concurrency_limited
+from credit_card_service.sharding import shard_aliases, shard_for_user
+from itertools import chain
 import json
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import HttpResponse
@@ -22,6 +26,7 @@ class RegisterUserView(APIView):
     GET:
     - Returns a styled HTML table displaying all registered users, including Aadhar Number.
     """
+    throttle_classes = [ClientRateThrottle]
 
     def validate_data(self, data):
         """
@@ -34,91 +39,16 @@ class RegisterUserView(APIView):
 
     def get(self, request):
         """Render an HTML form and display all registered users."""
-        users = User.objects.all()
-        user_data = [
-            {
-                "id": user.user_id,
-                "name": user.name,
-                "email": user.email,
-                "aadhar": user.aadhar_number,
-                "income": user.annual_income,
-            }
-            for user in users
-        ]
-
-        # HTML content with inline CSS
-        html_content = """
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Registered Users</title>
-            <style>
-                body { font-family: Arial, sans-serif; background-color: #f9f9f9; color: #333; }
-                h1, h2 { text-align: center; color: #4CAF50; }
-                form { max-width: 500px; margin: 20px auto; padding: 20px; background: #fff; border: 1px solid #ddd; border-radius: 8px; }
-                label { display: block; margin-bottom: 5px; font-weight: bold; }
-                input { width: 100%; padding: 8px; margin-bottom: 10px; border: 1px solid #ddd; border-radius: 4px; }
-                button { display: block; width: 100%; padding: 10px; background-color: #4CAF50; color: white; border: none; border-radius: 4px; font-size: 16px; }
-                button:hover { background-color: #45a049; }
-                table { margin: 20px auto; border-collapse: collapse; width: 90%; }
-                th, td { border: 1px solid #ddd; padding: 8px; text-align: center; }
-                th { background-color: #4CAF50; color: white; }
-                tr:nth-child(even) { background-color: #f2f2f2; }
-                tr:hover { background-color: #ddd; }
-            </style>
-        </head>
-        <body>
-            <h1>Register User</h1>
-            <form method="POST" action="/api/register-user/">
-                <label for="name">Name</label>
-                <input type="text" id="name" name="name" placeholder="Enter your name" required>
-                
-                <label for="aadhar_id">Aadhar ID</label>
-                <input type="text" id="aadhar_id" name="aadhar_id" placeholder="Enter your Aadhar ID" required>
-                
-                <label for="email_id">Email</label>
-                <input type="email" id="email_id" name="email_id" placeholder="Enter your email" required>
-                
-                <label for="annual_income">Annual Income</label>
-                <input type="number" id="annual_income" name="annual_income" placeholder="Enter your annual income" required>
-                
-                <button type="submit">Register</button>
-            </form>
-            <h2>Registered Users</h2>
-            <table>
-                <thead>
-                    <tr>
-                        <th>User ID</th>
-                        <th>Name</th>
-                        <th>Email</th>
-                        <th>Aadhar Number</th>
-                        <th>Annual Income</th>
-                    </tr>
-                </thead>
-                <tbody>
-        """
-
-        for user in user_data:
-            html_content += f"""
-                <tr>
-                    <td>{user['id']}</td>
-                    <td>{user['name']}</td>
-                    <td>{user['email']}</td>
-                    <td>{user['aadhar']}</td>
-                    <td>{user['income']}</td>
-                </tr>
-            """
-
-        html_content += """
-                </tbody>
-            </table>
-        </body>
-        </html>
-        """
-        return HttpResponse(html_content, content_type="text/html")
+        users = chain.from_iterable(
+            User.objects.using(shard).values("user_id", "name", "email", "aadhar_number", "annual_income").iterator()
+            for shard in shard_aliases()
+        )
+        page = stream_page("user/register_user.html", [
+            ("user_rows", "user/register_user_row.html", users, ("user_id", "annual_income")),
+        ])
+        return StreamingHttpResponse(page, content_type="text/html")
 
+    @concurrency_limited
     def post(self, request):
         try:
             # Parse and validate request data
@@ -135,11 +65,9 @@ class RegisterUserView(APIView):
                 email=email,
                 annual_income=annual_income,
             )
+            # Saving queues the credit score calculation through the outbox
             user.save()
 
-            # Trigger Celery task to calculate credit score
-            calculate_credit_score.delay(user.user_id)
-
             return Response(
                 data={
                     "user_id": str(user.user_id),
@@ -184,101 +112,21 @@ class ApplyLoanView(APIView):
 
     def get(self, request):
         """Render an HTML form for loan application and list all loans."""
-        loans = Loan.objects.filter(loan_type="Credit Card")
-        loan_data = [
-            {
-                "loan_id": loan.loan_id,
-                "user_name": loan.user.name,
-                "loan_amount": loan.loan_amount,
-                "interest_rate": loan.interest_rate,
-                "term_period": loan.term_period,
-                "disbursement_date": loan.disbursement_date.strftime('%d-%m-%Y'),
-            }
-            for loan in loans
+        loans = [
+            Loan.objects.using(shard).filter(loan_type="Credit Card").values(
+                "loan_id", "user__name", "loan_amount", "interest_rate", "term_period", "disbursement_date",
+            )
+            for shard in shard_aliases()
         ]
-
-        # HTML Content with Inline CSS and Form
-        html_content = """
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Apply for a Credit Card Loan</title>
-            <style>
-                body { font-family: Arial, sans-serif; background-color: #f9f9f9; color: #333; }
-                h1, h2 { text-align: center; color: #4CAF50; }
-                form { max-width: 500px; margin: 20px auto; padding: 20px; background: #fff; border: 1px solid #ddd; border-radius: 8px; }
-                label { display: block; margin-bottom: 5px; font-weight: bold; }
-                input, select { width: 100%; padding: 8px; margin-bottom: 10px; border: 1px solid #ddd; border-radius: 4px; }
-                button { display: block; width: 100%; padding: 10px; background-color: #4CAF50; color: white; border: none; border-radius: 4px; font-size: 16px; }
-                button:hover { background-color: #45a049; }
-                table { margin: 20px auto; border-collapse: collapse; width: 90%; }
-                th, td { border: 1px solid #ddd; padding: 8px; text-align: center; }
-                th { background-color: #4CAF50; color: white; }
-                tr:nth-child(even) { background-color: #f2f2f2; }
-                tr:hover { background-color: #ddd; }
-                .no-data { text-align: center; font-size: 18px; color: #666; margin-top: 20px; }
-            </style>
-        </head>
-        <body>
-            <h1>Apply for a Credit Card Loan</h1>
-            <form method="POST" action="/api/apply-loan/">
-                <label for="user_id">User ID</label>
-                <input type="text" id="user_id" name="user_id" placeholder="Enter your User ID" required>
-                
-                <label for="loan_amount">Loan Amount</label>
-                <input type="number" id="loan_amount" name="loan_amount" placeholder="Enter loan amount (max ₹5000)" required>
-                
-                <label for="disbursement_date">Disbursement Date</label>
-                <input type="date" id="disbursement_date" name="disbursement_date" required>
-                
-                <button type="submit">Submit Application</button>
-            </form>
-            
-            <h2>Existing Loans</h2>
-        """
-
-        if loan_data:
-            html_content += """
-            <table>
-                <thead>
-                    <tr>
-                        <th>Loan ID</th>
-                        <th>User Name</th>
-                        <th>Loan Amount</th>
-                        <th>Interest Rate (%)</th>
-                        <th>Term Period (Months)</th>
-                        <th>Disbursement Date</th>
-                    </tr>
-                </thead>
-                <tbody>
-            """
-            for loan in loan_data:
-                html_content += f"""
-                    <tr>
-                        <td>{loan['loan_id']}</td>
-                        <td>{loan['user_name']}</td>
-                        <td>{loan['loan_amount']}</td>
-                        <td>{loan['interest_rate']}</td>
-                        <td>{loan['term_period']}</td>
-                        <td>{loan['disbursement_date']}</td>
-                    </tr>
-                """
-            html_content += """
-                </tbody>
-            </table>
-            """
+        if not any(shard_loans.exists() for shard_loans in loans):
+            page = stream_page("user/apply_loan.html", [], has_loans=False)
         else:
-            html_content += """
-            <div class="no-data">No credit card loans available.</div>
-            """
-
-        html_content += """
-        </body>
-        </html>
-        """
-        return HttpResponse(html_content, content_type="text/html")
+            rows = chain.from_iterable(shard_loans.iterator() for shard_loans in loans)
+            safe = ("loan_id", "loan_amount", "interest_rate", "term_period", "disbursement_date")
+            page = stream_page(
+                "user/apply_loan.html", [("loan_rows", "user/apply_loan_row.html", rows, safe)], has_loans=True,
+            )
+        return StreamingHttpResponse(page, content_type="text/html")
 
     def post(self, request):
         """Process loan applications submitted via JSON or HTML form."""
@@ -295,17 +143,14 @@ class ApplyLoanView(APIView):
 
         # Fetch user from the database
         try:
-            user = User.objects.get(user_id=user_id)
-        except User.DoesNotExist:
+            user = User.objects.using(shard_for_user(user_id)).get(user_id=user_id)
+        except (User.DoesNotExist, ValueError):
             return HttpResponse("<h1>User not found. Please register before applying for a loan.</h1>", status=404)
 
         # Eligibility Checks
-        if user.credit_score < 450:
-            return HttpResponse("<h1>Loan declined. Credit score is too low.</h1>", status=400)
-        if user.annual_income < 150000:
-            return HttpResponse("<h1>Loan declined. Annual income is too low.</h1>", status=400)
-        if loan_amount > 5000:
-            return HttpResponse("<h1>Loan declined. Loan amount exceeds ₹5000.</h1>", status=400)
+        declined = check_eligibility(user, loan_amount)
+        if declined:
+            return HttpResponse(f"<h1>{declined}</h1>", status=400)
 
         # Parse and validate the disbursement date
         try:
@@ -323,6 +168,6 @@ class ApplyLoanView(APIView):
             disbursement_date=disbursement_date,
             principal_balance=loan_amount
         )
-        loan.save()
+        loan.save()  # Also opens the loan's ledger with its disbursement
 
         return HttpResponse("<h1>Loan application successful!</h1>", status=200)
\ No newline at end of file